@@ -0,0 +1,176 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# Acervo dos comprovantes em PDF, guardados por anos sem lotar uma única pasta.
+#
+# Cada PDF é gravado uma única vez, com o nome igual ao SHA-256 do conteúdo, em
+# subpastas pelos primeiros caracteres do hash (objetos/ab/cd/abcd....pdf).
+# Um índice SQLite liga funcionário, data e itens ao arquivo, e guarda também a
+# chave do conteúdo (hash do HTML e do CSS usados na renderização): o mesmo
+# comprovante pedido de novo (mesma entrega, mesmo dia, mesmo template) é
+# devolvido do acervo, sem renderizar outra vez.
+
+_formato_data = "%Y-%m-%d %H:%M:%S"
+
+_colunas = ("chave", "hash", "funcionario", "cnpj", "empresa", "entregue_em", "itens", "tamanho")
+
+
+def chave_conteudo(template, html_final):
+    # Identifica o comprovante pelo que entra na renderização (HTML preenchido e CSS do template)
+    h = hashlib.sha256()
+    h.update(template.estilos.encode("utf-8"))
+    h.update(b"\0")
+    h.update(html_final.encode("utf-8"))
+    return h.hexdigest()
+
+
+class Acervo:
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.objetos = os.path.join(pasta, "objetos")
+        os.makedirs(self.objetos, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(pasta, "indice.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS comprovantes (
+                    id INTEGER PRIMARY KEY,
+                    chave TEXT NOT NULL UNIQUE,
+                    hash TEXT NOT NULL,
+                    funcionario TEXT NOT NULL,
+                    cnpj TEXT NOT NULL,
+                    empresa TEXT NOT NULL,
+                    entregue_em TEXT NOT NULL,
+                    itens TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_comprovantes_funcionario ON comprovantes (cnpj, funcionario, entregue_em)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_comprovantes_data ON comprovantes (entregue_em)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_comprovantes_hash ON comprovantes (hash)")
+            # Itens de cada comprovante, para a busca por EPI
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS comprovante_itens (
+                    comprovante INTEGER NOT NULL REFERENCES comprovantes (id),
+                    codigo TEXT NOT NULL,
+                    quantidade INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_comprovante_itens_codigo ON comprovante_itens (codigo)")
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+    def caminho(self, hash_pdf):
+        return os.path.join(self.objetos, hash_pdf[:2], hash_pdf[2:4], hash_pdf + ".pdf")
+
+    def procurar(self, chave):
+        # Caminho do PDF já guardado para esta chave de conteúdo (ou None)
+        with self._lock:
+            linha = self._conn.execute("SELECT hash FROM comprovantes WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            return None
+        caminho = self.caminho(linha[0])
+        return caminho if os.path.exists(caminho) else None
+
+    def guardar(self, chave, dados, funcionario, cnpj, empresa, itens, entregue_em=None):
+        # itens: lista de (codigo, descricao, quantidade). Devolve o caminho do PDF no acervo.
+        hash_pdf = hashlib.sha256(dados).hexdigest()
+        caminho = self.caminho(hash_pdf)
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, caminho)
+
+        quando = (entregue_em or datetime.now()).strftime(_formato_data)
+        itens = [(str(cod), desc, int(qtd)) for cod, desc, qtd in itens]
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT OR IGNORE INTO comprovantes ({', '.join(_colunas)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (chave, hash_pdf, funcionario, cnpj, empresa, quando,
+                 json.dumps(itens, ensure_ascii=False), len(dados))
+            )
+            if cursor.rowcount:
+                self._conn.executemany(
+                    "INSERT INTO comprovante_itens (comprovante, codigo, quantidade) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, cod, qtd) for cod, _, qtd in itens]
+                )
+        return caminho
+
+    def _consultar(self, sql, parametros):
+        with self._lock:
+            linhas = self._conn.execute(sql, parametros).fetchall()
+        resultado = []
+        for linha in linhas:
+            registro = dict(zip(_colunas, linha))
+            registro["itens"] = [tuple(i) for i in json.loads(registro["itens"])]
+            registro["arquivo"] = self.caminho(registro["hash"])
+            resultado.append(registro)
+        return resultado
+
+    @staticmethod
+    def _periodo(desde, ate):
+        desde = (desde or datetime(1970, 1, 1)).strftime(_formato_data)
+        ate = (ate or datetime(9999, 12, 31)).strftime(_formato_data)
+        return desde, ate
+
+    def por_funcionario(self, funcionario, cnpj, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join(_colunas)} FROM comprovantes "
+            "WHERE cnpj = ? AND funcionario = ? AND entregue_em BETWEEN ? AND ? "
+            "ORDER BY entregue_em DESC",
+            (cnpj, funcionario, desde, ate)
+        )
+
+    def por_item(self, codigo, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join('c.' + c for c in _colunas)} FROM comprovante_itens i "
+            "JOIN comprovantes c ON c.id = i.comprovante "
+            "WHERE i.codigo = ? AND c.entregue_em BETWEEN ? AND ? "
+            "ORDER BY c.entregue_em DESC",
+            (str(codigo), desde, ate)
+        )
+
+    def por_periodo(self, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join(_colunas)} FROM comprovantes "
+            "WHERE entregue_em BETWEEN ? AND ? ORDER BY entregue_em DESC",
+            (desde, ate)
+        )
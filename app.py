@@ -18,29 +18,166 @@
 #
 # =============================================================================
 
+import time
+
+# Marca o início da importação do app (base do relatório --startup-profile)
+_t_inicio = time.perf_counter()
+
 import os
+import sys
+import argparse
 import configparser
 import tkinter as tk
 from tkinter import ttk, messagebox
 import platform
-import pandas as pd
 from datetime import datetime
-from weasyprint import HTML
-import requests
-from PIL import Image, ImageTk, ImageDraw  # Para criar imagens de checkboxes
+
+import catalogo
+import motor
+import omie
+import sincronizacao
+from tarefas import ExecutorTk
+from lista_virtual import ListaVirtual, CampoBusca
+from historico import Historico, exportar_csv
+from acervo import Acervo
+from fila_ajustes import FilaAjustes, DrenadorAjustes, PENDENTE, ERRO, INCERTO
+from metricas import metricas
+from observador import ObservadorArquivos
 
 # Diretório base do projeto
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Diretório de onde o app foi chamado (para resolver caminhos da linha de comando)
+cwd_inicial = os.getcwd()
+
 os.chdir(base_dir)
 
 data_path = os.path.join(base_dir, "data", "estoque.csv")
 funcionarios_path = os.path.join(base_dir, "data", "funcionarios.csv")
 template_path = os.path.join(base_dir, "tpl", "template.tpl")
 
+
+def pasta_local():
+    # Estado desta estação (fila de baixas, histórico, acervo): fica fora de data/, que
+    # pode ser uma pasta de rede compartilhada, onde o SQLite em modo WAL não funciona.
+    # Configurável em [Local] pasta no config.ini.
+    config = configparser.ConfigParser()
+    config.read("config.ini", encoding="utf-8")
+    pasta = config.get("Local", "pasta", fallback="")
+    if not pasta:
+        if platform.system() == "Windows":
+            raiz = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            raiz = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+        pasta = os.path.join(raiz, "RecibosEPI")
+    return os.path.join(base_dir, os.path.expanduser(pasta))
+
+
+local_dir = pasta_local()
+fila_path = os.path.join(local_dir, "ajustes.db")
+acervo_path = os.path.join(local_dir, "acervo")
+historico_path = os.path.join(local_dir, "historico.db")
+metricas_path = os.path.join(base_dir, "data", "metricas.jsonl")
+
+
+def abrir_pdf(filename):
+    try:
+        with metricas.span("abrir_pdf"):
+            if platform.system() == "Windows":
+                os.startfile(filename)
+            elif platform.system() == "Darwin":
+                os.system(f"open \"{filename}\"")
+            else:
+                os.system(f"xdg-open \"{filename}\"")
+        return True
+    except:
+        return False
+
+
+def renderizar_comprovante(entrega, acervo, historico, servidor_url=None):
+    # Executada fora da thread do Tk: não pode tocar em widgets nem messagebox
+    def gerar_no_servidor(entrega):
+        import servidor_pdf
+
+        f = entrega.funcionario
+        try:
+            with metricas.span("servidor_pdf"):
+                return servidor_pdf.renderizar_remoto(servidor_url, f.nome, f.empresa, entrega.itens,
+                                                      entrega.data_comprovante)
+        except Exception:
+            # Servidor de PDF indisponível: gera localmente
+            return None
+
+    with metricas.span("comprovante", itens=len(entrega.itens)) as span:
+        filename, novo = motor.arquivar(entrega, template_path, base_dir, acervo,
+                                        gerar_no_servidor if servidor_url else None)
+        span["reimpressao"] = not novo
+        # Anexado aqui (e não no retorno para a tela) para valer mesmo se o app for fechado durante a geração
+        motor.registrar_pdf(historico, entrega, filename)
+        return filename, abrir_pdf(filename)
+
+def criar_cliente_omie(config):
+    return omie.ClienteOmie(
+        config["EstoqueAjuste"].get("url"), config["Omie"].get("app_key"), config["Omie"].get("app_secret"),
+        conexoes=config["Omie"].getint("conexoes", fallback=4),
+        tentativas=config["Omie"].getint("tentativas", fallback=3),
+        timeout=config["Omie"].getfloat("timeout", fallback=10),
+    )
+
+
+def opcoes_sincronizacao(config):
+    secao = config["Sincronizacao"] if "Sincronizacao" in config else {}
+    return {
+        "url": secao.get("url", "https://app.omie.com.br/api/v1/geral/produtos/"),
+        "por_pagina": int(secao.get("registros_por_pagina", 500)),
+        "campo_codigo": secao.get("campo_codigo", "codigo"),
+    }
+
+
+def configurar_metricas(config):
+    # Log das medidas ligado por padrão; arquivo do Prometheus só se configurado
+    secao = config["Metricas"] if "Metricas" in config else {}
+    metricas.configurar(
+        log=secao.get("log", metricas_path) or None,
+        tamanho_max=int(float(secao.get("tamanho_max_mb", 5)) * 1024 * 1024),
+        arquivos=int(secao.get("arquivos", 3)),
+        prometheus=secao.get("prometheus") or None,
+        intervalo_prometheus=float(secao.get("intervalo_prometheus", 15)),
+    )
+
+
+def reler_catalogo(ler, caminho, antigas, chave):
+    # Executada fora da thread do Tk: relê o CSV alterado e compara com as linhas da lista
+    novas = ler(caminho)
+    return antigas, novas, catalogo.diferenca(antigas, novas, chave)
+
+
+class PerfilInicio:
+
+    # Tempo de cada fase da abertura do app (opção --startup-profile)
+
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.fases = []
+        self._ultimo = _t_inicio
+
+    def marcar(self, fase):
+        agora = time.perf_counter()
+        self.fases.append((fase, agora - self._ultimo))
+        self._ultimo = agora
+
+    def relatorio(self):
+        largura = max(len(f) for f, _ in self.fases)
+        linhas = [f"{fase.ljust(largura)}  {tempo * 1000:8.1f} ms" for fase, tempo in self.fases]
+        total = sum(t for _, t in self.fases)
+        linhas.append(f"{'total'.ljust(largura)}  {total * 1000:8.1f} ms")
+        return "\n".join(linhas)
+
+
 class AppEpis:
 
-    def __init__(self):
+    def __init__(self, perfil=None):
+        self.perfil = perfil or PerfilInicio()
         self.janela = tk.Tk()
         self.janela.title("IMAH - Recibo de Entrega de EPIs")
 
@@ -87,8 +224,7 @@ class AppEpis:
         self.tree_func.column("Empresa", width=300, anchor="w")
         self.tree_func.column("CNPJ", width=150, anchor="center")
 
-        scrollbar_func = ttk.Scrollbar(frame_func, orient="vertical", command=self.tree_func.yview)
-        self.tree_func.configure(yscrollcommand=scrollbar_func.set)
+        scrollbar_func = ttk.Scrollbar(frame_func, orient="vertical")
         self.tree_func.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 5), pady=10)
         scrollbar_func.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=10)
 
@@ -125,14 +261,21 @@ class AppEpis:
         self.tree_epis.tag_configure("checked", image=self.im_checked)
         self.tree_epis.tag_configure("unchecked", image=self.im_unchecked)
 
-        scrollbar_epis = ttk.Scrollbar(frame_epis, orient="vertical", command=self.tree_epis.yview)
-        self.tree_epis.configure(yscrollcommand=scrollbar_epis.set)
+        scrollbar_epis = ttk.Scrollbar(frame_epis, orient="vertical")
         self.tree_epis.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 5), pady=10)
         scrollbar_epis.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=10)
 
+        # Listas virtuais: os dados ficam em memória e só as linhas visíveis existem no widget.
+        # Nos EPIs, a seleção do Treeview define os checkboxes marcados.
+        self.lista_func = ListaVirtual(self.tree_func, scrollbar_func)
+        self.lista_epis = ListaVirtual(self.tree_epis, scrollbar_epis, marcacao=("checked", "unchecked"))
+
+        # Busca por funcionário/empresa/CNPJ e por código/descrição
+        self.busca_func = CampoBusca(frame_func, self.lista_func, colunas=(0, 1, 2))
+        self.busca_epis = CampoBusca(frame_epis, self.lista_epis, colunas=(0, 1))
+
         # Bindings
-        self.tree_epis.bind("<Button-1>", self.handle_checkbox_click)
-        self.tree_epis.bind("<<TreeviewSelect>>", self.handle_epis_selection)
+        self.tree_epis.bind("<Button-1>", self.handle_checkbox_click, add="+")
 
         # Botão principal
         btn_frame = tk.Frame(self.janela, bg="#f0f0f0")
@@ -145,6 +288,30 @@ class AppEpis:
         )
         self.btn_imprimir.pack(side=tk.RIGHT, padx=20, pady=10)
 
+        self.btn_historico = ttk.Button(
+            btn_frame,
+            text="Histórico do Funcionário",
+            command=self.abrir_historico
+        )
+        self.btn_historico.pack(side=tk.RIGHT, padx=(20, 0), pady=10)
+
+        # Indicador de comprovantes sendo gerados em segundo plano
+        self.progresso = ttk.Progressbar(btn_frame, mode="indeterminate", length=150)
+        self.lbl_progresso = tk.Label(btn_frame, text="", bg="#f0f0f0", fg="#34495e", font=("Helvetica", 11))
+
+        self.executor = ExecutorTk(self.janela)
+        self.executor.ao_mudar(self.atualizar_progresso)
+
+        # Situação da fila de baixas no Omie
+        self.lbl_pendentes = tk.Label(btn_frame, text="", bg="#f0f0f0", fg="#34495e", font=("Helvetica", 11))
+        self.lbl_pendentes.pack(side=tk.LEFT, padx=20, pady=10)
+        self.lbl_pendentes.bind("<Button-1>", lambda e: self.mostrar_erros_fila())
+
+        # Painel de diagnóstico (tempos de cada fase)
+        self.janela.bind("<F12>", lambda e: self.abrir_diagnostico())
+
+        self.perfil.marcar("janela e widgets")
+
         # Carregar config para API Omie
         self.config = configparser.ConfigParser()
         if not self.config.read("config.ini", encoding="utf-8"):
@@ -168,11 +335,121 @@ class AppEpis:
             self.janela.destroy()
             return
 
+        configurar_metricas(self.config)
+        self.omie = criar_cliente_omie(self.config)
+
+        # Servidor de PDF compartilhado (opcional)
+        self.servidor_pdf_url = None
+        if "ServidorPDF" in self.config:
+            self.servidor_pdf_url = self.config["ServidorPDF"].get("url") or None
+
+        self.perfil.marcar("configuração")
+
+        # Fila local de baixas: gravadas na confirmação e enviadas em segundo plano
+        self.fila = FilaAjustes(fila_path)
+        self.drenador = DrenadorAjustes(self.fila, self.omie)
+        self.drenador.iniciar()
+        self.atualizar_pendentes()
+        self.perfil.marcar("fila de baixas")
+
+        # Histórico local das entregas e acervo dos comprovantes em PDF
+        self.historico = Historico(historico_path)
+        self.acervo = Acervo(acervo_path)
+
+        # Sincronização periódica do catálogo de EPIs com o Omie (desligada com intervalo 0)
+        self.executor_fundo = ExecutorTk(self.janela)
+        self.sincronizando = False
+        self.intervalo_sincronizacao = 0
+        if "Sincronizacao" in self.config:
+            self.intervalo_sincronizacao = self.config["Sincronizacao"].getfloat("intervalo_minutos", fallback=0)
+        if self.intervalo_sincronizacao > 0:
+            self.janela.after(int(self.intervalo_sincronizacao * 60000), self.sincronizar_epis)
+
         # Carregar dados
         self.carregar_funcionarios()
+        self.perfil.marcar("funcionários")
         self.carregar_epis()
+        self.perfil.marcar("EPIs")
+
+        # Recarrega os cadastros quando os CSVs são alterados, sem reiniciar o app
+        self.observador = ObservadorArquivos(
+            self.janela, [funcionarios_path, data_path], self.catalogo_alterado
+        ).iniciar()
+
+    def atualizar_pendentes(self):
+        contagem = self.fila.contagem()
+        pendentes = contagem.get(PENDENTE, 0)
+        erros = contagem.get(ERRO, 0)
+        incertos = contagem.get(INCERTO, 0)
+        texto = f"Baixas pendentes no Omie: {pendentes}" if pendentes else ""
+        if erros:
+            texto += ("  |  " if texto else "") + f"Baixas com erro: {erros}"
+        if incertos:
+            texto += ("  |  " if texto else "") + f"Baixas a conferir: {incertos}"
+        self.lbl_pendentes.configure(text=texto, fg="#c0392b" if erros or incertos else "#34495e")
+        self.janela.after(2000, self.atualizar_pendentes)
+
+    def mostrar_erros_fila(self):
+        if self.fila.erros():
+            self.conferir_fila(ERRO)
+        if self.fila.incertos():
+            self.conferir_fila(INCERTO)
+
+    def conferir_fila(self, status):
+        # Baixas com erro ou sem resposta do Omie: o operador decide, item a item
+        if status == ERRO:
+            titulo = "Baixas com Erro no Omie"
+            texto = ("O Omie recusou estas baixas. Corrija a causa (ex: produto não cadastrado) e reenvie,\n"
+                     "ou descarte as que não devem ser lançadas.")
+            listar, resolver_fila, manter = self.fila.erros, self.fila.resolver_erros, "Descartar selecionadas"
+        else:
+            titulo = "Baixas a Conferir no Omie"
+            texto = ("O Omie não respondeu a estas baixas depois do envio; elas podem ter sido lançadas.\n"
+                     "Confira no Omie: reenvie as que não constam lá e marque como lançadas as que constam.")
+            listar, resolver_fila, manter = self.fila.incertos, self.fila.resolver_incertos, "Marcar como lançadas"
+
+        janela = tk.Toplevel(self.janela)
+        janela.title(titulo)
+        janela.geometry("1000x500")
+        janela.configure(bg="#f8f9fa")
+
+        main_frame = ttk.Frame(janela, padding="20 15 20 20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(main_frame, text=texto, font=("Helvetica", 11)).pack(anchor="w", pady=(0, 10))
+
+        cols = ("Data", "Código", "Quantidade", "Observação", "Erro")
+        tree = ttk.Treeview(main_frame, columns=cols, show="headings", selectmode="extended")
+        for col, largura in zip(cols, (90, 90, 90, 380, 300)):
+            tree.heading(col, text=col)
+            tree.column(col, width=largura, anchor="w")
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        def carregar():
+            tree.delete(*tree.get_children())
+            for chave, payload, mensagem, _ in listar():
+                p = payload["param"][0]
+                tree.insert("", "end", iid=chave, values=(p["data"], p["cod_int"], p["quan"], p["obs"], mensagem))
+
+        def resolver(reenviar):
+            chaves = tree.selection()
+            if not chaves:
+                messagebox.showwarning("Aviso", "Selecione as baixas.", parent=janela)
+                return
+            resolver_fila(chaves, reenviar)
+            if reenviar:
+                self.drenador.acordar()
+            carregar()
+
+        botoes = ttk.Frame(main_frame)
+        botoes.pack(pady=(10, 0))
+        ttk.Button(botoes, text="Reenviar selecionadas", command=lambda: resolver(True)).pack(side=tk.LEFT, padx=10)
+        ttk.Button(botoes, text=manter, command=lambda: resolver(False)).pack(side=tk.LEFT, padx=10)
+        carregar()
+        janela.transient(self.janela)
 
     def create_checkbox_images(self):
+        from PIL import Image, ImageTk, ImageDraw  # Para criar imagens de checkboxes
+
         size = 16
         # Imagem unchecked (caixa vazia)
         unchecked = Image.new("RGBA", (size, size), (0, 0, 0, 0))
@@ -190,43 +467,28 @@ class AppEpis:
         return im_checked, im_unchecked
 
     def desmarcar_todos_epis(self):
-        for item in self.tree_epis.get_children():
-            self.tree_epis.item(item, tags=("unchecked",))
-        self.tree_epis.selection_remove(self.tree_epis.get_children())
+        self.lista_epis.limpar_selecao()
 
     def handle_checkbox_click(self, event):
         col = self.tree_epis.identify_column(event.x)
         item = self.tree_epis.identify_row(event.y)
-        if col == "#0" and item:  # Clique na coluna de checkbox
-            tags = self.tree_epis.item(item, "tags")
-            if "checked" in tags:
-                new_tag = "unchecked"
-                self.tree_epis.selection_remove(item)
-            else:
-                new_tag = "checked"
-                self.tree_epis.selection_add(item)
-            self.tree_epis.item(item, tags=(new_tag,))
+        indice = self.lista_epis.indice_do_item(item)
+        if col == "#0" and indice is not None:  # Clique na coluna de checkbox
+            self.lista_epis.alternar(indice)
             return "break"
 
-    def handle_epis_selection(self, event):
-        selected = set(self.tree_epis.selection())
-        for item in self.tree_epis.get_children():
-            should_be_checked = item in selected
-            current_tags = self.tree_epis.item(item, "tags")
-            new_tag = "checked" if should_be_checked else "unchecked"
-            if new_tag not in current_tags:
-                self.tree_epis.item(item, tags=(new_tag,))
+    def epis_selecionados(self):
+        # (codigo, descricao) dos EPIs marcados, na ordem da lista (ignora linhas de erro)
+        linhas = self.lista_epis.linhas
+        return [linhas[i] for i in self.lista_epis.selecao() if linhas[i][0]]
 
     def abrir_modal_quantidades(self):
-        selected_func = self.tree_func.selection()
+        selected_func = self.lista_func.selecao()
         if not selected_func:
             messagebox.showwarning("Aviso", "Selecione um funcionário primeiro.")
             return
-        func_values = self.tree_func.item(selected_func[0], "values")
-        funcionario = func_values[0]
-        empresa = func_values[1]
-        cnpj = func_values[2]
-        itens_marcados = [i for i in self.tree_epis.get_children() if "checked" in self.tree_epis.item(i, "tags")]
+        funcionario = motor.Funcionario(*self.lista_func.linhas[selected_func[0]])
+        itens_marcados = self.epis_selecionados()
         if not itens_marcados:
             messagebox.showwarning("Aviso", "Marque pelo menos um EPI para entrega.")
             return
@@ -241,8 +503,9 @@ class AppEpis:
         main_frame.pack(fill=tk.BOTH, expand=True)
 
         ttk.Label(main_frame, text="COMPROVANTE DE ENTREGA DE EPI", font=("Helvetica", 16, "bold")).pack(anchor="center", pady=(0, 15))
-        ttk.Label(main_frame, text=f"Funcionário: {funcionario}", font=("Helvetica", 13)).pack(anchor="w")
-        ttk.Label(main_frame, text=f"Empresa: {empresa} - CNPJ: {cnpj}", font=("Helvetica", 11)).pack(anchor="w", pady=(0, 25))
+        ttk.Label(main_frame, text=f"Funcionário: {funcionario.nome}", font=("Helvetica", 13)).pack(anchor="w")
+        ttk.Label(main_frame, text=f"Empresa: {funcionario.empresa} - CNPJ: {funcionario.cnpj}",
+                  font=("Helvetica", 11)).pack(anchor="w", pady=(0, 25))
 
         grid_frame = ttk.Frame(main_frame)
         grid_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 30))
@@ -261,13 +524,11 @@ class AppEpis:
         tree_modal.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar_modal.pack(side=tk.RIGHT, fill=tk.Y)
 
-        itens_data = []
-        for item in itens_marcados:
-            v = self.tree_epis.item(item, "values")
-            codigo = v[0]
-            descricao = v[1]
-            tree_modal.insert("", "end", values=(codigo, descricao, "1"))
-            itens_data.append({"codigo": int(codigo), "descricao": descricao, "qtd": 1})
+        # Quantidade de cada EPI, pela linha do modal
+        itens_data = {}
+        for codigo, descricao in itens_marcados:
+            iid = tree_modal.insert("", "end", values=(codigo, descricao, "1"))
+            itens_data[iid] = motor.Item(codigo, descricao, 1)
 
         entry_edit = None
         item_editando = None
@@ -297,20 +558,14 @@ class AppEpis:
                 return
             nova = entry_edit.get().strip() or "0"
             try:
-                q = int(nova)
-                if q < 0:
-                    raise ValueError
-            except:
+                q = motor.validar_quantidade(nova, minimo=0)
+            except motor.ErroEntrega:
                 messagebox.showwarning("Erro", "Quantidade deve ser um número inteiro positivo.", parent=modal)
                 entry_edit.focus()
                 return
             values = tree_modal.item(item_editando, "values")
             tree_modal.item(item_editando, values=(values[0], values[1], str(q)))
-            codigo_int = int(values[0])
-            for it in itens_data:
-                if it["codigo"] == codigo_int:
-                    it["qtd"] = q
-                    break
+            itens_data[item_editando].quantidade = q
             entry_edit.destroy()
             entry_edit = None
             item_editando = None
@@ -324,47 +579,33 @@ class AppEpis:
         inner_buttons.pack()
 
         def gerar_pdf_e_baixa():
-            itens_finais = [(it["codigo"], it["descricao"], it["qtd"]) for it in itens_data if it["qtd"] > 0]
-            if not itens_finais:
-                messagebox.showwarning("Aviso", "Informe pelo menos uma quantidade maior que zero.")
+            try:
+                entrega = motor.montar_entrega(funcionario, itens_data.values())
+            except motor.ErroEntrega as e:
+                messagebox.showwarning("Aviso", str(e))
                 return
 
-            data_atual = datetime.now().strftime("%d/%m/%Y")
-            data_omie = datetime.now().strftime("%d/%m/%Y")
-
-            # 1. Dispara baixa no Omie para cada item
+            # 1. Registra as baixas na fila local; o envio ao Omie é feito em segundo plano
             if self.ajustar:
+                try:
+                    novas = motor.enfileirar_baixa(self.fila, self.omie, entrega)
+                except Exception as e:
+                    messagebox.showerror("Erro", f"Erro ao registrar a baixa de estoque: {str(e)}")
+                    return
+                self.drenador.acordar()
+                if novas < len(entrega.itens):
+                    messagebox.showwarning(
+                        "Aviso", f"{len(entrega.itens) - novas} baixa(s) desta entrega já estavam na fila e não foram "
+                                 "registradas de novo.")
+
+            # Registra a entrega no histórico junto com a baixa; o PDF é anexado quando ficar pronto
+            try:
+                motor.registrar_historico(self.historico, entrega)
+            except Exception as e:
+                messagebox.showerror("Erro", f"Erro ao registrar a entrega no histórico: {str(e)}")
 
-                for cod_int, desc, qtd in itens_finais:
-                    payload = {
-                        "call": "IncluirAjusteEstoque",
-                        "app_key": self.app_key,
-                        "app_secret": self.app_secret,
-                        "param": [{
-                            "codigo_local_estoque": 0,
-                            "cod_int": cod_int,
-                            "data": data_omie,
-                            "quan": str(qtd),
-                            "obs": f"FOI ENTREGUE AO COLABORADOR {funcionario.upper()} O(S) EPI(S) RELACIONADOS NO COMPROVANTE GERADO EM {data_atual}.",
-                            "origem": "AJU",
-                            "tipo": "SAI",
-                            "motivo": "INV"
-                        }]
-                    }
-
-                    try:
-                        response = requests.post(self.omie_url, json=payload, timeout=10)
-                        if response.status_code == 200:
-                            result = response.json()
-                            if result.get("faultcode"):
-                                messagebox.showerror("Erro Omie", f"Erro ao dar baixa no item {cod_int}: {result.get('faultstring')}")
-                        else:
-                            messagebox.showerror("Erro Omie", f"HTTP {response.status_code} ao dar baixa no item {cod_int}")
-                    except Exception as e:
-                        messagebox.showerror("Erro de Rede", f"Erro ao conectar com Omie para o item {cod_int}: {str(e)}")
-            
             # 2. Gera o PDF
-            self.gerar_comprovante_pdf(funcionario, empresa, itens_finais, data_atual)
+            self.gerar_comprovante_pdf(entrega)
 
             # Mensagem final
             # if sucesso_total:
@@ -391,95 +632,338 @@ class AppEpis:
         modal.grab_set()
         self.janela.wait_window(modal)
 
-    def gerar_comprovante_pdf(self, funcionario, empresa, itens, data_hoje):
-        if not os.path.exists(template_path):
-            messagebox.showerror("Erro", "Arquivo TEMPLATE_CONTROLE_EPI.tpl não encontrado!")
+    def sincronizar_epis(self):
+        if self.intervalo_sincronizacao > 0:
+            self.janela.after(int(self.intervalo_sincronizacao * 60000), self.sincronizar_epis)
+        if self.sincronizando:
             return
+        self.sincronizando = True
+        opcoes = opcoes_sincronizacao(self.config)
+        self.executor_fundo.enviar(
+            sincronizacao.sincronizar, self.omie, opcoes["url"], data_path,
+            opcoes["por_pagina"], opcoes["campo_codigo"],
+            ao_concluir=self.epis_sincronizados,
+            ao_falhar=self.sincronizacao_falhou,
+        )
 
-        with open(template_path, "r", encoding="utf-8") as f:
-            html_template = f.read()
-
-        tabela_itens = """
-        <table border="1" cellpadding="8" cellspacing="0" style="width:100%; border-collapse: collapse; margin-top: 20px;">
-            <thead>
-                <tr style="background-color: #f0f0f0;">
-                    <th style="text-align: center;">Código</th>
-                    <th style="text-align: left;">Descrição do EPI</th>
-                    <th style="text-align: center;">Quantidade</th>
-                </tr>
-            </thead>
-            <tbody>
-        """
-        for cod, desc, qtd in itens:
-            tabela_itens += f"""
-                <tr>
-                    <td style="text-align: center;">{cod}</td>
-                    <td>{desc}</td>
-                    <td style="text-align: center;">{qtd}</td>
-                </tr>
-            """
-        tabela_itens += """
-            </tbody>
-        </table>
-        """
-
-        html_final = html_template.replace("{{NOME_FUNCIONARIO}}", funcionario) \
-                                  .replace("{{NOME_DA_EMPRESA}}", empresa) \
-                                  .replace("{{DATA_HOJE}}", data_hoje) \
-                                  .replace("{{TABELA_DE_ITENS}}", tabela_itens)
-
-        filename = f"Comprovante_EPI.pdf"
+    def epis_sincronizados(self, diferenca):
+        self.sincronizando = False
+        if diferenca.inseridos or diferenca.removidos or diferenca.alterados:
+            # A sincronização grava os EPIs novos no fim do CSV: no fim da lista é a mesma posição
+            self.lista_epis.aplicar_diferenca(diferenca, catalogo.chave_epi)
+            self.busca_epis.indexar(self.lista_epis.linhas)
+
+    def sincronizacao_falhou(self, erro):
+        # Falha na sincronização em segundo plano não interrompe o operador; tenta no próximo ciclo
+        self.sincronizando = False
+        print(f"Erro na sincronização do catálogo: {str(erro)}", file=sys.stderr)
+
+    def catalogo_alterado(self, caminho):
+        if caminho == funcionarios_path:
+            lista, busca, ler, chave = self.lista_func, self.busca_func, catalogo.ler_funcionarios, catalogo.chave_funcionario
+        else:
+            lista, busca, ler, chave = self.lista_epis, self.busca_epis, catalogo.ler_epis, catalogo.chave_epi
+        self.executor_fundo.enviar(
+            reler_catalogo, ler, caminho, lista.linhas, chave,
+            ao_concluir=lambda r: self.catalogo_relido(lista, busca, chave, r),
+            ao_falhar=lambda e: print(f"Erro ao recarregar {os.path.basename(caminho)}: {str(e)}", file=sys.stderr),
+        )
 
-        try:
-            HTML(string=html_final, base_url=base_dir).write_pdf(filename)
-        except Exception as e:
-            messagebox.showerror("Erro PDF", f"Erro ao gerar PDF: {str(e)}")
+    def catalogo_relido(self, lista, busca, chave, resultado):
+        antigas, novas, diferenca = resultado
+        if lista.linhas is not antigas:
+            # A lista mudou enquanto o arquivo era relido (ex: sincronização): refaz a comparação
+            diferenca = catalogo.diferenca(lista.linhas, novas, chave)
+        if diferenca.inseridos or diferenca.removidos or diferenca.alterados:
+            lista.aplicar_diferenca(diferenca, chave, novas)
+            busca.indexar(lista.linhas)
+
+    def abrir_historico(self):
+        selected_func = self.lista_func.selecao()
+        if not selected_func:
+            messagebox.showwarning("Aviso", "Selecione um funcionário primeiro.")
             return
+        funcionario, empresa, cnpj = self.lista_func.linhas[selected_func[0]]
+        entregas = self.historico.ultimos_doze_meses(funcionario, cnpj)
 
-        try:
-            if platform.system() == "Windows":
-                os.startfile(filename)
-            elif platform.system() == "Darwin":
-                os.system(f"open \"{filename}\"")
-            else:
-                os.system(f"xdg-open \"{filename}\"")
-        except:
+        janela = tk.Toplevel(self.janela)
+        janela.title("Histórico de Entregas")
+        janela.geometry("1000x600")
+        janela.configure(bg="#f8f9fa")
+
+        main_frame = ttk.Frame(janela, padding="30 20 30 30")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(main_frame, text=f"Funcionário: {funcionario}", font=("Helvetica", 13)).pack(anchor="w")
+        ttk.Label(main_frame, text=f"Empresa: {empresa} - CNPJ: {cnpj}", font=("Helvetica", 11)).pack(anchor="w")
+        ttk.Label(main_frame, text=f"Entregas nos últimos 12 meses: {len(entregas)} item(ns)",
+                  font=("Helvetica", 11)).pack(anchor="w", pady=(0, 15))
+
+        grid_frame = ttk.Frame(main_frame)
+        grid_frame.pack(fill=tk.BOTH, expand=True)
+        cols = ("Data", "Código", "Descrição", "Quantidade")
+        tree = ttk.Treeview(grid_frame, columns=cols, show="headings")
+        tree.heading("Data", text="Data")
+        tree.heading("Código", text="Código")
+        tree.heading("Descrição", text="Descrição do EPI")
+        tree.heading("Quantidade", text="Quantidade")
+        tree.column("Data", width=160, anchor="center")
+        tree.column("Código", width=120, anchor="center")
+        tree.column("Descrição", width=500, anchor="w")
+        tree.column("Quantidade", width=120, anchor="center")
+        scrollbar = ttk.Scrollbar(grid_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Duplo clique reabre o PDF guardado no acervo (reimpressão sem gerar de novo)
+        pdfs = {}
+        for e in entregas:
+            data = datetime.strptime(e["entregue_em"], "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M")
+            iid = tree.insert("", "end", values=(data, e["codigo"], e["descricao"], e["quantidade"]))
+            pdfs[iid] = e["pdf"]
+
+        def reimprimir(event):
+            pdf = pdfs.get(tree.identify_row(event.y))
+            if not pdf or not os.path.exists(pdf):
+                messagebox.showwarning("Aviso", "Comprovante desta entrega não encontrado.", parent=janela)
+                return
+            if not abrir_pdf(pdf):
+                messagebox.showinfo("Comprovante", f"Arquivo:\n{pdf}", parent=janela)
+
+        tree.bind("<Double-1>", reimprimir)
+        ttk.Label(main_frame, text="Dê um duplo clique em uma entrega para reabrir o comprovante.",
+                  font=("Helvetica", 10)).pack(anchor="w", pady=(10, 0))
+
+        janela.transient(self.janela)
+
+    def abrir_diagnostico(self):
+        janela = tk.Toplevel(self.janela)
+        janela.title("Diagnóstico - Tempo por Fase")
+        janela.geometry("760x480")
+        janela.configure(bg="#f8f9fa")
+
+        main_frame = ttk.Frame(janela, padding="20 15 20 20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(main_frame, text="Últimas medidas de cada fase desde a abertura do app",
+                  font=("Helvetica", 11)).pack(anchor="w", pady=(0, 10))
+
+        cols = ("Fase", "Amostras", "p50", "p95", "Máximo")
+        tree = ttk.Treeview(main_frame, columns=cols, show="headings", height=10)
+        for col in cols:
+            tree.heading(col, text=col if col in ("Fase", "Amostras") else f"{col} (ms)")
+            tree.column(col, width=220 if col == "Fase" else 120, anchor="w" if col == "Fase" else "e")
+        tree.pack(fill=tk.BOTH, expand=True)
+        lbl_status = ttk.Label(main_frame, text="", font=("Helvetica", 10))
+        lbl_status.pack(anchor="w", pady=(10, 0))
+
+        def atualizar():
+            if not janela.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for fase, n, p50, p95, maximo in metricas.resumo():
+                tree.insert("", "end", values=(fase, n, f"{p50 * 1000:.1f}", f"{p95 * 1000:.1f}", f"{maximo * 1000:.1f}"))
+            status = sorted((codigo, n) for (fase, codigo), n in metricas.contagem_status().items() if fase == "omie")
+            lbl_status.configure(text="Respostas do Omie: " + (", ".join(f"{c}: {n}" for c, n in status) or "nenhuma"))
+            janela.after(2000, atualizar)
+
+        atualizar()
+        janela.transient(self.janela)
+
+    def gerar_comprovante_pdf(self, entrega):
+        if not os.path.exists(template_path):
+            messagebox.showerror("Erro", "Arquivo TEMPLATE_CONTROLE_EPI.tpl não encontrado!")
+            return
+
+        # A renderização roda em segundo plano; a tela fica livre para a próxima entrega
+        self.executor.enviar(
+            renderizar_comprovante, entrega, self.acervo, self.historico, self.servidor_pdf_url,
+            ao_concluir=self.comprovante_gerado,
+            ao_falhar=self.comprovante_falhou,
+        )
+
+    def comprovante_gerado(self, resultado):
+        filename, aberto = resultado
+        if not aberto:
             messagebox.showinfo("PDF Gerado", f"Arquivo salvo como:\n{filename}")
 
+    def comprovante_falhou(self, erro):
+        messagebox.showerror("Erro PDF", f"Erro ao gerar PDF: {str(erro)}")
+
+    def atualizar_progresso(self, pendentes):
+        if pendentes:
+            self.lbl_progresso.configure(text=f"Gerando {pendentes} comprovante(s)...")
+            if not self.progresso.winfo_ismapped():
+                self.progresso.pack(side=tk.RIGHT, padx=(0, 10), pady=10)
+                self.lbl_progresso.pack(side=tk.RIGHT, pady=10)
+                self.progresso.start(10)
+        elif self.progresso.winfo_ismapped():
+            self.progresso.stop()
+            self.progresso.pack_forget()
+            self.lbl_progresso.pack_forget()
+
     def carregar_funcionarios(self):
         if not os.path.exists(funcionarios_path):
-            self.tree_func.insert("", "end", values=("ERRO: data/funcionarios.csv não encontrado!", "", ""))
+            self.lista_func.definir_linhas([("ERRO: data/funcionarios.csv não encontrado!", "", "")])
             return
         try:
-            df = pd.read_csv(funcionarios_path, sep=",", encoding="utf-8", dtype=str)
-            df = df.dropna(subset=["funcionario", "empresa", "cnpj"])
-            df["funcionario"] = df["funcionario"].astype(str).str.strip()
-            df["empresa"] = df["empresa"].astype(str).str.strip()
-            df["cnpj"] = df["cnpj"].astype(str).str.strip()
-            dados = df[["funcionario", "empresa", "cnpj"]].values.tolist()
-            dados.sort(key=lambda x: x[0].upper())
-            for d in dados:
-                self.tree_func.insert("", "end", values=d)
+            with metricas.span("csv_funcionarios") as span:
+                linhas = catalogo.ler_funcionarios(funcionarios_path)
+                span["linhas"] = len(linhas)
+            self.lista_func.definir_linhas(linhas)
+            self.busca_func.indexar(self.lista_func.linhas)
         except Exception as e:
-            self.tree_func.insert("", "end", values=("Erro ao carregar funcionários:", str(e), ""))
+            self.lista_func.definir_linhas([("Erro ao carregar funcionários:", str(e), "")])
 
     def carregar_epis(self):
         if not os.path.exists(data_path):
-            self.tree_epis.insert("", "end", values=("", "ERRO: data/estoque.csv não encontrado!"), tags=("unchecked",))
+            self.lista_epis.definir_linhas([("", "ERRO: data/estoque.csv não encontrado!")])
             return
         try:
-            df = pd.read_csv(data_path, sep=";", encoding="utf-8", usecols=["Código", "Descrição"], dtype=str)
-            df = df.dropna(subset=["Código", "Descrição"])
-            df["Código"] = df["Código"].astype(str).str.strip()
-            for _, row in df.iterrows():
-                self.tree_epis.insert("", "end", values=(row["Código"], row["Descrição"]), tags=("unchecked",))
+            with metricas.span("csv_epis") as span:
+                linhas = catalogo.ler_epis(data_path)
+                span["linhas"] = len(linhas)
+            self.lista_epis.definir_linhas(linhas)
+            self.busca_epis.indexar(self.lista_epis.linhas)
         except Exception as e:
-            self.tree_epis.insert("", "end", values=("", f"Erro: {str(e)}"), tags=("unchecked",))
+            self.lista_epis.definir_linhas([("", f"Erro: {str(e)}")])
 
     def run(self):
+        if self.perfil.ativo and hasattr(self, "drenador"):
+            self.janela.update()
+            self.perfil.marcar("primeira exibição")
+            print(self.perfil.relatorio(), file=sys.stderr)
         self.janela.mainloop()
+        # Conclui os comprovantes que ainda estão sendo gerados
+        self.executor.encerrar()
+        if hasattr(self, "drenador"):
+            self.observador.parar()
+            if self.drenador.parar():
+                self.fila.fechar()
+            # Senão, o lote em envio fica como "enviando" e vai para conferência na próxima abertura
+            self.historico.fechar()
+            self.acervo.fechar()
+            self.executor_fundo.encerrar(esperar=False)
+
+
+def executar_lote(args):
+    import lote
+
+    if not os.path.exists(template_path):
+        print("Erro: arquivo tpl/template.tpl não encontrado!", file=sys.stderr)
+        return 1
+    entregas = os.path.join(cwd_inicial, args.lote)
+    saida = os.path.join(cwd_inicial, args.saida)
+    historico = Historico(historico_path)
+    acervo = Acervo(acervo_path)
+    try:
+        if args.combinado:
+            combinado = os.path.join(cwd_inicial, args.combinado)
+            quantidade, paginas, erros = lote.gerar_lote_combinado(
+                entregas, funcionarios_path, data_path, template_path,
+                combinado, base_dir, historico=historico, acervo=acervo
+            )
+            resumo = f"{quantidade} comprovante(s) gerado(s) em {combinado} ({paginas} página(s))"
+        else:
+            gerados, erros = lote.gerar_lote(
+                entregas, funcionarios_path, data_path, template_path,
+                saida, base_dir, processos=args.processos, historico=historico, acervo=acervo
+            )
+            resumo = f"{len(gerados)} comprovante(s) gerado(s) em {saida}"
+    except Exception as e:
+        print(f"Erro no lote: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        historico.fechar()
+        acervo.fechar()
+
+    for erro in erros:
+        print(erro, file=sys.stderr)
+    print(resumo)
+    return 1 if erros else 0
+
+
+def executar_servidor_pdf(args):
+    import servidor_pdf
+
+    servidor = servidor_pdf.ServidorPDF((args.host, args.porta), template_path, base_dir, processos=args.processos)
+    print(f"Servidor de PDF em http://{args.host}:{args.porta}/ (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+def executar_sincronizacao(args):
+    config = configparser.ConfigParser()
+    if not config.read("config.ini", encoding="utf-8") or "Omie" not in config or "EstoqueAjuste" not in config:
+        print("Erro: config.ini deve conter as seções [Omie] e [EstoqueAjuste]", file=sys.stderr)
+        return 1
+    configurar_metricas(config)
+    cliente = criar_cliente_omie(config)
+    opcoes = opcoes_sincronizacao(config)
+    try:
+        diferenca = sincronizacao.sincronizar(
+            cliente, opcoes["url"], data_path, opcoes["por_pagina"], opcoes["campo_codigo"]
+        )
+    except Exception as e:
+        print(f"Erro na sincronização: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        cliente.fechar()
+    print(f"Catálogo sincronizado: {sincronizacao.resumo(diferenca)}")
+    return 0
+
+
+def executar_relatorio_troca(args):
+    historico = Historico(historico_path)
+    try:
+        vencidos = historico.para_troca(args.relatorio_troca)
+    finally:
+        historico.fechar()
+    exportar_csv(vencidos, sys.stdout)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Geração de Recibos de EPIs")
+    parser.add_argument("--lote", metavar="ARQUIVO",
+                        help="gera os comprovantes sem interface a partir de um CSV de entregas (funcionario;codigo;quantidade)")
+    parser.add_argument("--saida", default=os.path.join(base_dir, "comprovantes"),
+                        help="diretório dos PDFs gerados no modo lote (padrão: comprovantes/)")
+    parser.add_argument("--combinado", metavar="ARQUIVO_PDF",
+                        help="no modo lote, gera todos os comprovantes em um único PDF (para imprimir de uma vez)")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="número de processos de renderização no modo lote e no servidor de PDFs (padrão: nº de CPUs)")
+    parser.add_argument("--servidor-pdf", action="store_true",
+                        help="inicia o servidor de PDFs compartilhado pelas estações")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="endereço do servidor de PDFs (padrão: 127.0.0.1; use 0.0.0.0 para a rede local)")
+    parser.add_argument("--porta", type=int, default=8765,
+                        help="porta do servidor de PDFs (padrão: 8765)")
+    parser.add_argument("--sincronizar", action="store_true",
+                        help="atualiza data/estoque.csv com o cadastro de produtos do Omie e sai")
+    parser.add_argument("--relatorio-troca", metavar="DIAS", type=int,
+                        help="lista (CSV) os EPIs cuja última entrega ao funcionário passou de DIAS dias")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="mostra o tempo de cada fase da abertura do app")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    app = AppEpis()
+    args = parse_args()
+    os.makedirs(local_dir, exist_ok=True)
+    if args.lote:
+        sys.exit(executar_lote(args))
+    if args.servidor_pdf:
+        sys.exit(executar_servidor_pdf(args))
+    if args.sincronizar:
+        sys.exit(executar_sincronizacao(args))
+    if args.relatorio_troca is not None:
+        sys.exit(executar_relatorio_troca(args))
+    perfil = PerfilInicio(args.startup_profile)
+    perfil.marcar("importações")
+    app = AppEpis(perfil)
     app.run()
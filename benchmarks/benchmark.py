@@ -0,0 +1,350 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Permite importar os módulos do app a partir da pasta benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalogo
+import comprovante
+import omie
+from busca import IndiceBusca
+from fila_ajustes import FilaAjustes, DrenadorAjustes, chave_ajuste
+import sincronizacao
+from mock_omie import MockOmie
+
+# Benchmarks de desempenho com dados sintéticos, sem precisar de tela (as partes
+# que usam o Tk só rodam se houver display, ex: xvfb-run) nem da API Omie real
+# (usa um servidor local com latência configurável).
+#
+#   python benchmarks/benchmark.py --saida resultado.json
+#   python benchmarks/benchmark.py --saida novo.json --baseline resultado.json
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+template_path = os.path.join(base_dir, "tpl", "template.tpl")
+
+_nomes = ["João", "Maria", "José", "Antônio", "Francisca", "Ana", "Luíz", "Paulo", "Carlos", "Márcia",
+          "Pedro", "Lucas", "Gabriel", "Rafael", "Juliana", "Fernanda", "Patrícia", "Aline", "Bruno", "Diego"]
+_sobrenomes = ["Silva", "Santos", "Oliveira", "Souza", "Conceição", "Pereira", "Lima", "Gonçalves",
+               "Rodrigues", "Ferreira", "Alves", "Costa", "Ribeiro", "Martins", "Carvalho", "Araújo"]
+_tipos = ["Luva", "Bota", "Capacete", "Óculos", "Protetor Auricular", "Máscara", "Avental", "Creme",
+          "Cinto de Segurança", "Macacão"]
+_materiais = ["Nitrílica", "de Couro", "PVC", "Tyvek", "de Raspa", "Plug", "PFF2", "Incolor", "Fumê"]
+
+
+# ---- Dados sintéticos ----
+
+def gerar_dados(pasta, linhas, semente=42):
+    rnd = random.Random(semente)
+    empresas = [
+        (f"Empresa {i} LTDA", f"{rnd.randint(10, 99)}.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}/0001-{rnd.randint(10, 99)}")
+        for i in range(max(1, linhas // 500))
+    ]
+    funcionarios = os.path.join(pasta, "funcionarios.csv")
+    with open(funcionarios, "w", encoding="utf-8") as f:
+        f.write("funcionario,empresa,cnpj\n")
+        for _ in range(linhas):
+            empresa, cnpj = rnd.choice(empresas)
+            nome = f"{rnd.choice(_nomes)} {rnd.choice(_sobrenomes)} {rnd.choice(_sobrenomes)}"
+            f.write(f"{nome},{empresa},{cnpj}\n")
+
+    estoque = os.path.join(pasta, "estoque.csv")
+    epis = []
+    with open(estoque, "w", encoding="utf-8") as f:
+        f.write("Código;Descrição\n")
+        for i in range(linhas):
+            descricao = f"{rnd.choice(_tipos)} {rnd.choice(_materiais)} Tam {rnd.randint(1, 12)} CA {rnd.randint(1000, 49999)}"
+            epis.append((str(100000 + i), descricao))
+            f.write(f"{100000 + i};{descricao}\n")
+    return funcionarios, estoque, epis
+
+
+# ---- Medição ----
+
+class Resultados:
+
+    def __init__(self, repeticoes):
+        self.repeticoes = repeticoes
+        self.resultados = {}
+        self.ignorados = {}
+
+    def medir(self, nome, funcao, preparar=None, repeticoes=None):
+        tempos = []
+        for _ in range(repeticoes or self.repeticoes):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+        self.resultados[nome] = {
+            "mediana": statistics.median(tempos),
+            "minimo": min(tempos),
+            "repeticoes": len(tempos),
+        }
+        print(f"{nome:60s} {statistics.median(tempos) * 1000:10.2f} ms", flush=True)
+
+    def ignorar(self, nome, motivo):
+        self.ignorados[nome] = motivo
+        print(f"{nome:60s} {'ignorado':>13s} ({motivo})", flush=True)
+
+
+def _remover(caminho):
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+# ---- Benchmarks ----
+
+def bench_catalogo(r, pasta, linhas):
+    funcionarios, estoque, _ = gerar_dados(pasta, linhas)
+    for nome, ler, caminho in (("funcionarios", catalogo.ler_funcionarios, funcionarios),
+                               ("epis", catalogo.ler_epis, estoque)):
+        r.medir(f"catalogo.ler_{nome}[{linhas}] csv", lambda: ler(caminho, usar_cache=False))
+        r.medir(f"catalogo.ler_{nome}[{linhas}] snapshot", lambda: ler(caminho),
+                preparar=lambda: ler(caminho))
+
+
+def bench_busca(r, pasta, linhas):
+    funcionarios, estoque, _ = gerar_dados(pasta, linhas)
+    dados_func = catalogo.ler_funcionarios(funcionarios)
+    dados_epis = catalogo.ler_epis(estoque)
+    r.medir(f"busca.indice funcionarios[{linhas}]", lambda: IndiceBusca(dados_func, (0, 1, 2)), repeticoes=3)
+    r.medir(f"busca.indice epis[{linhas}]", lambda: IndiceBusca(dados_epis, (0, 1)), repeticoes=3)
+    indice = IndiceBusca(dados_func, (0, 1, 2))
+    consultas = ["j", "jo", "joao", "joao s", "joao silva", "conceicao", "0001"]
+    r.medir(f"busca.buscar funcionarios[{linhas}] {len(consultas)} consultas",
+            lambda: [indice.buscar(c) for c in consultas])
+
+
+def bench_carregar_funcionarios(r, pasta, linhas):
+    # A parte do AppEpis.carregar_funcionarios que não depende do Tk: leitura do CSV
+    # (com o snapshot, como no app) e o índice da busca, montado em segundo plano
+    funcionarios, _, _ = gerar_dados(pasta, linhas)
+
+    def carregar():
+        IndiceBusca(catalogo.ler_funcionarios(funcionarios), (0, 1, 2))
+
+    r.medir(f"carregar_funcionarios sem Tk (leitura + índice)[{linhas}]", carregar,
+            preparar=lambda: catalogo.ler_funcionarios(funcionarios), repeticoes=3)
+
+
+def bench_lista(r, pasta, linhas):
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        raiz = tk.Tk()
+    except Exception as e:
+        r.ignorar(f"lista_virtual[{linhas}]", f"sem display: {str(e).splitlines()[0]}")
+        return
+    from lista_virtual import ListaVirtual
+
+    _, estoque, _ = gerar_dados(pasta, linhas)
+    dados = catalogo.ler_epis(estoque)
+    try:
+        tree = ttk.Treeview(raiz, columns=("Código", "Descrição"), show="tree headings", height=20)
+        scrollbar = ttk.Scrollbar(raiz, orient="vertical")
+        tree.pack()
+        lista = ListaVirtual(tree, scrollbar, marcacao=("checked", "unchecked"))
+        raiz.update()
+
+        r.medir(f"carregar_epis (lista virtual)[{linhas}]", lambda: lista.definir_linhas(dados))
+
+        def clicar():
+            for i in range(0, 20):
+                lista.alternar(i)
+
+        r.medir(f"seleção: 20 cliques no checkbox[{linhas}]", clicar)
+
+        def selecionar():
+            tree.selection_set(tree.get_children()[:5])
+            lista._ao_selecionar(None)
+
+        r.medir(f"seleção: <<TreeviewSelect>>[{linhas}]", selecionar, preparar=lista.limpar_selecao)
+        r.medir(f"rolagem: 100 passos[{linhas}]", lambda: [lista.rolar(7) for _ in range(100)],
+                preparar=lambda: lista.rolar(-linhas))
+    finally:
+        raiz.destroy()
+
+
+def bench_comprovante(r, pasta):
+    template = comprovante.carregar_template(template_path)
+    rnd = random.Random(1)
+    pdf_disponivel = True
+    try:
+        import weasyprint  # noqa: F401
+    except Exception as e:
+        pdf_disponivel = False
+        motivo = str(e).splitlines()[0][:80]
+
+    for n in (1, 10, 50, 200):
+        itens = [(100000 + i, f"{rnd.choice(_tipos)} {rnd.choice(_materiais)}", rnd.randint(1, 5)) for i in range(n)]
+        r.medir(f"comprovante.montar_html[{n} itens]",
+                lambda: comprovante.montar_html(template, "João da Silva", "Empresa 1 LTDA", itens, "01/01/2026"))
+        nome = f"gerar_comprovante_pdf[{n} itens]"
+        if not pdf_disponivel:
+            r.ignorar(nome, f"WeasyPrint indisponível: {motivo}")
+            continue
+        destino = os.path.join(pasta, "bench.pdf")
+
+        def gerar():
+            html_final = comprovante.montar_html(template, "João da Silva", "Empresa 1 LTDA", itens, "01/01/2026")
+            comprovante.gerar_pdf(template, html_final, destino, base_dir)
+
+        r.medir(nome, gerar, repeticoes=3)
+
+
+def bench_omie(r, pasta, latencia, itens=15):
+    servidor = MockOmie(latencia=latencia).iniciar()
+    try:
+        cliente = omie.ClienteOmie(servidor.url, "k", "s", backoff=0.01)
+        payloads = [cliente.montar_ajuste(100000 + i, 1, "João da Silva", "01/01/2026", "01/01/2026")
+                    for i in range(itens)]
+
+        # Referência: um POST bloqueante por item, como era feito antes do cliente com pool
+        def sequencial():
+            for p in payloads:
+                cliente.incluir_ajuste(p)
+
+        r.medir(f"omie: baixa sequencial[{itens} itens, {latencia * 1000:.0f} ms]", sequencial, repeticoes=3)
+        r.medir(f"omie: baixa em paralelo[{itens} itens, {latencia * 1000:.0f} ms]",
+                lambda: cliente.incluir_ajustes(payloads), repeticoes=3)
+
+        caminho_fila = os.path.join(pasta, "ajustes.db")
+
+        def preparar_fila():
+            _remover(caminho_fila)
+            fila = FilaAjustes(caminho_fila)
+            fila.registrar([(chave_ajuste("João", "1", "01/01/2026", 100000 + i), p) for i, p in enumerate(payloads)])
+            preparar_fila.fila = fila
+
+        def drenar():
+            DrenadorAjustes(preparar_fila.fila, cliente, lote=itens).drenar()
+            preparar_fila.fila.fechar()
+
+        r.medir(f"fila: drenar[{itens} itens, {latencia * 1000:.0f} ms]", drenar,
+                preparar=preparar_fila, repeticoes=3)
+        cliente.fechar()
+    finally:
+        servidor.parar()
+
+
+def bench_sincronizacao(r, pasta, linhas, latencia):
+    _, estoque, epis = gerar_dados(pasta, linhas)
+    produtos = [{"codigo": c, "descricao": d, "inativo": "N"} for c, d in epis]
+    # Algumas alterações para o diff ter trabalho
+    for p in produtos[::100]:
+        p["descricao"] += " (novo)"
+    servidor = MockOmie(latencia=latencia, produtos=produtos).iniciar()
+    try:
+        cliente = omie.ClienteOmie(servidor.url, "k", "s")
+        original = open(estoque, "rb").read()
+
+        def restaurar():
+            with open(estoque, "wb") as f:
+                f.write(original)
+
+        r.medir(f"sincronizacao[{linhas}]", lambda: sincronizacao.sincronizar(cliente, servidor.url, estoque),
+                preparar=restaurar, repeticoes=3)
+        cliente.fechar()
+    finally:
+        servidor.parar()
+
+
+# ---- Comparação ----
+
+def comparar(atual, baseline, tolerancia):
+    regressoes = []
+    print()
+    print(f"{'benchmark':60s} {'baseline':>10s} {'atual':>10s} {'variação':>9s}")
+    for nome, medida in atual["resultados"].items():
+        base = baseline.get("resultados", {}).get(nome)
+        if not base or not base["mediana"]:
+            continue
+        variacao = medida["mediana"] / base["mediana"] - 1
+        marca = ""
+        if variacao > tolerancia:
+            marca = "  REGRESSÃO"
+            regressoes.append(nome)
+        print(f"{nome:60s} {base['mediana'] * 1000:8.2f}ms {medida['mediana'] * 1000:8.2f}ms {variacao:+8.0%}{marca}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da Geração de Recibos de EPIs")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="quantidades de linhas dos CSVs sintéticos (padrão: 1000 10000 100000)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="repetições de cada medida (padrão: 5)")
+    parser.add_argument("--latencia", type=float, default=0.05,
+                        help="latência do servidor Omie simulado, em segundos (padrão: 0.05)")
+    parser.add_argument("--saida", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--baseline", help="compara com um JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="variação acima da qual o resultado é marcado como regressão (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    r = Resultados(args.repeticoes)
+    with tempfile.TemporaryDirectory(prefix="bench_epis_") as pasta:
+        for linhas in args.tamanhos:
+            bench_catalogo(r, pasta, linhas)
+            bench_busca(r, pasta, linhas)
+            bench_carregar_funcionarios(r, pasta, linhas)
+            bench_lista(r, pasta, linhas)
+        bench_comprovante(r, pasta)
+        bench_omie(r, pasta, args.latencia)
+        bench_sincronizacao(r, pasta, max(args.tamanhos), args.latencia)
+
+    atual = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "sistema": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "parametros": {"tamanhos": args.tamanhos, "repeticoes": args.repeticoes, "latencia": args.latencia},
+        "resultados": r.resultados,
+        "ignorados": r.ignorados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = comparar(atual, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Servidor local que imita a API Omie (IncluirAjusteEstoque e ListarProdutos),
+# com latência configurável, para benchmarks e testes sem acesso à rede.
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        servidor = self.server
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+        with servidor.lock:
+            servidor.chamadas += 1
+
+        call = corpo.get("call")
+        param = (corpo.get("param") or [{}])[0]
+        if call == "IncluirAjusteEstoque":
+            resposta = {"codigo_ajuste": servidor.chamadas, "codigo_status": "0", "descricao_status": "OK"}
+        elif call == "ListarProdutos":
+            por_pagina = int(param.get("registros_por_pagina", 50))
+            pagina = int(param.get("pagina", 1))
+            produtos = servidor.produtos[(pagina - 1) * por_pagina:pagina * por_pagina]
+            resposta = {
+                "pagina": pagina,
+                "total_de_paginas": max(1, -(-len(servidor.produtos) // por_pagina)),
+                "registros": len(produtos),
+                "total_de_registros": len(servidor.produtos),
+                "produto_servico_cadastro": produtos,
+            }
+        else:
+            resposta = {"faultcode": "SOAP-ENV:Client-100", "faultstring": f"Método {call} não suportado"}
+
+        dados = json.dumps(resposta).encode("utf-8")
+        self.send_response(500 if "faultcode" in resposta else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+class MockOmie(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, latencia=0.0, produtos=None, endereco=("127.0.0.1", 0)):
+        super().__init__(endereco, _Handler)
+        self.latencia = latencia
+        self.produtos = produtos or []
+        self.chamadas = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,132 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import re
+import unicodedata
+from itertools import chain
+
+# Índice de busca para as listas (funcionários e EPIs), montado uma vez na carga.
+# O texto é normalizado (sem acentos e sem diferença de maiúsculas) e quebrado em
+# palavras; o índice guarda palavra -> linhas e, sobre o vocabulário (bem menor que
+# o número de linhas), trigramas e prefixos. Termos de 1-2 letras casam com o início
+# das palavras; termos maiores com qualquer trecho da palavra.
+
+_re_nao_alfanum = re.compile(r"[\W_]+")
+_re_numero_formatado = re.compile(r"\d[\W_]+\d")
+
+# Prefixos de 1-2 letras com mais palavras que isto têm as linhas reunidas na montagem do índice
+_limite_prefixo = 2000
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+
+    def __init__(self, linhas, colunas):
+        self.total = len(linhas)
+        self.palavras = {}
+        cache = {}
+        for indice, linha in enumerate(linhas):
+            for col in colunas:
+                valor = linha[col]
+                tokens = cache.get(valor)
+                if tokens is None:
+                    tokens = self._tokens(valor)
+                    cache[valor] = tokens
+                for token in tokens:
+                    linhas_token = self.palavras.get(token)
+                    if linhas_token is None:
+                        self.palavras[token] = [indice]
+                    elif linhas_token[-1] != indice:
+                        linhas_token.append(indice)
+
+        self.vocabulario = list(self.palavras)
+        self.trigramas = {}
+        self.prefixos = {}
+        for n, palavra in enumerate(self.vocabulario):
+            for tri in _trigramas(palavra):
+                self.trigramas.setdefault(tri, []).append(n)
+            self.prefixos.setdefault(palavra[:1], []).append(n)
+            if len(palavra) >= 2:
+                self.prefixos.setdefault(palavra[:2], []).append(n)
+
+        # Um prefixo que abre boa parte do vocabulário (ex: "1" em códigos) custaria, na
+        # consulta, juntar as linhas de milhares de palavras: é feito aqui, uma vez
+        self._linhas_prefixo = {}
+        for prefixo, palavras in self.prefixos.items():
+            if len(palavras) > _limite_prefixo:
+                vocabulario = self.vocabulario
+                self._linhas_prefixo[prefixo] = set(chain.from_iterable(
+                    self.palavras[vocabulario[n]] for n in palavras))
+
+        self._cache_termos = {}
+
+    @staticmethod
+    def _tokens(valor):
+        valor = normalizar(valor)
+        tokens = set(valor.split())
+        # Números formatados (CNPJ, códigos) também entram sem pontuação
+        if _re_numero_formatado.search(valor):
+            tokens.add(_re_nao_alfanum.sub("", valor))
+        tokens.update(t for t in _re_nao_alfanum.split(valor) if t)
+        return tokens
+
+    def _palavras_do_termo(self, termo):
+        if len(termo) < 3:
+            return self.prefixos.get(termo, [])
+        conjuntos = sorted((self.trigramas.get(tri, ()) for tri in _trigramas(termo)), key=len)
+        candidatos = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            if not candidatos:
+                break
+            candidatos.intersection_update(conjunto)
+        vocabulario = self.vocabulario
+        return [n for n in candidatos if termo in vocabulario[n]]
+
+    def _linhas_do_termo(self, termo):
+        # Linhas que têm alguma palavra casando com o termo (com cache, útil na digitação)
+        linhas = self._linhas_prefixo.get(termo) or self._cache_termos.get(termo)
+        if linhas is None:
+            linhas = set()
+            vocabulario = self.vocabulario
+            for n in self._palavras_do_termo(termo):
+                linhas.update(self.palavras[vocabulario[n]])
+            if len(self._cache_termos) > 256:
+                self._cache_termos.clear()
+            self._cache_termos[termo] = linhas
+        return linhas
+
+    def buscar(self, consulta):
+        # Lista ordenada dos índices das linhas que casam com todos os termos (None = sem filtro)
+        termos = normalizar(consulta).split()
+        if not termos:
+            return None
+        conjuntos = sorted((self._linhas_do_termo(t) for t in set(termos)), key=len)
+        if len(conjuntos) == 1:
+            return sorted(conjuntos[0])
+        resultado = conjuntos[0].intersection(*conjuntos[1:])
+        return sorted(resultado)
@@ -0,0 +1,183 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import hashlib
+import io
+import json
+import os
+import platform
+import struct
+import threading
+from collections import namedtuple
+
+# Leitura dos CSVs de cadastro, compartilhada entre a interface e o modo lote.
+#
+# O resultado já tratado (sem vazios, com espaços removidos e ordenado) é gravado
+# ao lado do CSV em um snapshot binário colunar (<arquivo>.snap). Enquanto o CSV
+# não muda (mtime/tamanho, ou o hash do conteúdo quando só o mtime mudou), o
+# snapshot é lido no lugar do CSV, sem passar pelo pandas (que só é importado
+# quando algum CSV precisa ser reprocessado).
+#
+# Formato do snapshot: assinatura, cabeçalho JSON (com os metadados do CSV de
+# origem) e, para cada coluna, um bloco UTF-8 com os valores separados por \0.
+
+# Diferença entre duas versões de um catálogo: linhas novas (na ordem de origem),
+# chaves removidas e {chave: linha} das linhas alteradas
+Diferenca = namedtuple("Diferenca", ["inseridos", "removidos", "alterados"])
+
+_assinatura = b"EPISNAP1"
+_separador = "\0"
+
+
+def _tratar_funcionarios(dados):
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(dados), sep=",", encoding="utf-8", dtype=str)
+    df = df.dropna(subset=["funcionario", "empresa", "cnpj"])
+    df["funcionario"] = df["funcionario"].astype(str).str.strip()
+    df["empresa"] = df["empresa"].astype(str).str.strip()
+    df["cnpj"] = df["cnpj"].astype(str).str.strip()
+    linhas = df[["funcionario", "empresa", "cnpj"]].values.tolist()
+    linhas.sort(key=lambda x: x[0].upper())
+    return [tuple(l) for l in linhas]
+
+
+def _tratar_epis(dados):
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(dados), sep=";", encoding="utf-8", usecols=["Código", "Descrição"], dtype=str)
+    df = df.dropna(subset=["Código", "Descrição"])
+    df["Código"] = df["Código"].astype(str).str.strip()
+    return list(zip(df["Código"], df["Descrição"]))
+
+
+def _caminho_snapshot(caminho):
+    return caminho + ".snap"
+
+
+def _ler_snapshot(caminho_snap, tipo):
+    # Devolve (cabeçalho, linhas) ou None se o snapshot não existir/for inválido
+    try:
+        with open(caminho_snap, "rb") as f:
+            dados = f.read()
+    except OSError:
+        return None
+    if not dados.startswith(_assinatura):
+        return None
+    try:
+        pos = len(_assinatura)
+        (tam,) = struct.unpack_from("<I", dados, pos)
+        pos += 4
+        cabecalho = json.loads(dados[pos:pos + tam].decode("utf-8"))
+        pos += tam
+        if cabecalho.get("tipo") != tipo:
+            return None
+        colunas = []
+        for _ in range(cabecalho["colunas"]):
+            (tam,) = struct.unpack_from("<Q", dados, pos)
+            pos += 8
+            bloco = dados[pos:pos + tam].decode("utf-8")
+            pos += tam
+            colunas.append(bloco.split(_separador) if cabecalho["linhas"] else [])
+    except (struct.error, ValueError, KeyError):
+        return None
+    if any(len(c) != cabecalho["linhas"] for c in colunas):
+        return None
+    return cabecalho, list(zip(*colunas))
+
+
+def _gravar_snapshot(caminho_snap, cabecalho, linhas, n_colunas):
+    colunas = [[l[i] for l in linhas] for i in range(n_colunas)]
+    if any(_separador in v for c in colunas for v in c):
+        return
+    cabecalho = dict(cabecalho, linhas=len(linhas), colunas=n_colunas)
+    partes = [_assinatura]
+    bruto = json.dumps(cabecalho).encode("utf-8")
+    partes.append(struct.pack("<I", len(bruto)))
+    partes.append(bruto)
+    for coluna in colunas:
+        bloco = _separador.join(coluna).encode("utf-8")
+        partes.append(struct.pack("<Q", len(bloco)))
+        partes.append(bloco)
+
+    # Grava em arquivo temporário e troca de uma vez, para nunca deixar snapshot pela metade.
+    # O nome é único por máquina/processo/thread: várias estações podem regravar o snapshot
+    # na mesma pasta de rede ao mesmo tempo.
+    temporario = f"{caminho_snap}.{platform.node()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporario, "wb") as f:
+            f.write(b"".join(partes))
+        os.replace(temporario, caminho_snap)
+    except OSError:
+        # Sem permissão de escrita (ex: pasta de rede somente leitura): segue sem cache
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+
+
+def _ler_com_cache(caminho, tipo, tratar, n_colunas, usar_cache=True):
+    st = os.stat(caminho)
+    caminho_snap = _caminho_snapshot(caminho)
+    snapshot = _ler_snapshot(caminho_snap, tipo) if usar_cache else None
+    if snapshot:
+        cabecalho, linhas = snapshot
+        if cabecalho["mtime_ns"] == st.st_mtime_ns and cabecalho["tamanho"] == st.st_size:
+            return linhas
+
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    sha1 = hashlib.sha1(dados).hexdigest()
+
+    if snapshot and cabecalho["sha1"] == sha1:
+        # Arquivo regravado com o mesmo conteúdo: só atualiza os metadados
+        linhas = snapshot[1]
+    else:
+        linhas = tratar(dados)
+
+    if usar_cache:
+        cabecalho = {"tipo": tipo, "mtime_ns": st.st_mtime_ns, "tamanho": st.st_size, "sha1": sha1}
+        _gravar_snapshot(caminho_snap, cabecalho, linhas, n_colunas)
+    return linhas
+
+
+def ler_funcionarios(caminho, usar_cache=True):
+    return _ler_com_cache(caminho, "funcionarios", _tratar_funcionarios, 3, usar_cache)
+
+
+def ler_epis(caminho, usar_cache=True):
+    return _ler_com_cache(caminho, "epis", _tratar_epis, 2, usar_cache)
+
+
+def diferenca(antigas, novas, chave):
+    por_chave = {chave(l): l for l in antigas}
+    novas_por_chave = {chave(l): l for l in novas}
+    inseridos = [l for k, l in novas_por_chave.items() if k not in por_chave]
+    removidos = {k for k in por_chave if k not in novas_por_chave}
+    alterados = {k: l for k, l in novas_por_chave.items() if k in por_chave and por_chave[k] != l}
+    return Diferenca(inseridos, removidos, alterados)
+
+
+def chave_epi(linha):
+    return linha[0]
+
+
+def chave_funcionario(linha):
+    return (linha[2], linha[0])
@@ -0,0 +1,243 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import os
+import re
+import threading
+import unicodedata
+from html import escape
+
+from metricas import metricas
+
+# Montagem do HTML do comprovante a partir do template e geração do PDF.
+# O template é compilado uma única vez em segmentos fixos e campos ({{CAMPO}}) e
+# fica em cache até o arquivo ser alterado (mtime/tamanho).
+# O WeasyPrint (importação lenta) só é carregado no primeiro PDF.
+
+_re_campo = re.compile(r"\{\{([A-Z_]+)\}\}")
+_re_estilo = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+_re_corpo = re.compile(r"(<body[^>]*>)(.*)(</body>)", re.S | re.I)
+
+# Cada comprovante do PDF combinado começa em uma nova página
+_css_combinado = ".comprovante + .comprovante { page-break-before: always; }"
+
+# Opções de gravação do PDF para arquivos menores: imagens recomprimidas/reduzidas e
+# fontes embutidas só com os caracteres usados (subconjunto)
+opcoes_pdf = {"optimize_images": True, "jpeg_quality": 85, "dpi": 200, "full_fonts": False}
+
+# Campos que já recebem HTML pronto e não devem ser escapados
+_campos_html = {"TABELA_DE_ITENS"}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class TemplateCompilado:
+
+    def __init__(self, texto):
+        # O CSS embutido é separado para ser interpretado pelo WeasyPrint uma única vez
+        self.estilos = "\n".join(_re_estilo.findall(texto))
+        texto = _re_estilo.sub("", texto)
+
+        # Lista alternando texto fixo (posições pares) e nomes de campos (posições ímpares)
+        self.segmentos = _re_campo.split(texto)
+
+        # Partes fixas antes/depois do <body> e campos só do corpo (para o PDF combinado)
+        m = _re_corpo.search(texto)
+        if m:
+            self.inicio_documento = texto[:m.end(1)]
+            self.segmentos_corpo = _re_campo.split(m.group(2))
+            self.fim_documento = texto[m.start(3):]
+        else:
+            self.inicio_documento = ""
+            self.segmentos_corpo = self.segmentos
+            self.fim_documento = ""
+
+        self._css = None
+        self._css_combinado = None
+        self._fontes = None
+
+    def preencher(self, valores, segmentos=None):
+        partes = (self.segmentos if segmentos is None else segmentos)[:]
+        for i in range(1, len(partes), 2):
+            nome = partes[i]
+            if nome not in valores:
+                partes[i] = "{{%s}}" % nome
+            elif nome in _campos_html:
+                partes[i] = valores[nome]
+            else:
+                partes[i] = escape(str(valores[nome]))
+        return "".join(partes)
+
+    def folha_estilo(self, base_url):
+        if self._css is None:
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+
+            self._fontes = FontConfiguration()
+            self._css = CSS(string=self.estilos, base_url=base_url, font_config=self._fontes)
+        return self._css, self._fontes
+
+    def folha_estilo_combinado(self, base_url):
+        css, fontes = self.folha_estilo(base_url)
+        if self._css_combinado is None:
+            from weasyprint import CSS
+
+            self._css_combinado = CSS(string=_css_combinado, font_config=fontes)
+        return [css, self._css_combinado], fontes
+
+
+def carregar_template(caminho):
+    st = os.stat(caminho)
+    chave = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        em_cache = _cache.get(caminho)
+        if em_cache and em_cache[0] == chave:
+            return em_cache[1]
+    with open(caminho, "r", encoding="utf-8") as f:
+        template = TemplateCompilado(f.read())
+    with _cache_lock:
+        _cache[caminho] = (chave, template)
+    return template
+
+
+_cabecalho_tabela = """
+        <table border="1" cellpadding="8" cellspacing="0" style="width:100%; border-collapse: collapse; margin-top: 20px;">
+            <thead>
+                <tr style="background-color: #f0f0f0;">
+                    <th style="text-align: center;">Código</th>
+                    <th style="text-align: left;">Descrição do EPI</th>
+                    <th style="text-align: center;">Quantidade</th>
+                </tr>
+            </thead>
+            <tbody>
+        """
+
+_linha_tabela = """
+                <tr>
+                    <td style="text-align: center;">{}</td>
+                    <td>{}</td>
+                    <td style="text-align: center;">{}</td>
+                </tr>
+            """
+
+_rodape_tabela = """
+            </tbody>
+        </table>
+        """
+
+
+def montar_tabela_itens(itens):
+    partes = [_cabecalho_tabela]
+    partes.extend(
+        _linha_tabela.format(escape(str(cod)), escape(str(desc)), escape(str(qtd)))
+        for cod, desc, qtd in itens
+    )
+    partes.append(_rodape_tabela)
+    return "".join(partes)
+
+
+def _valores(funcionario, empresa, itens, data_hoje):
+    return {
+        "NOME_FUNCIONARIO": funcionario,
+        "NOME_DA_EMPRESA": empresa,
+        "DATA_HOJE": data_hoje,
+        "TABELA_DE_ITENS": montar_tabela_itens(itens),
+    }
+
+
+def montar_html(template, funcionario, empresa, itens, data_hoje):
+    with metricas.span("preencher_template", itens=len(itens)):
+        return template.preencher(_valores(funcionario, empresa, itens, data_hoje))
+
+
+def montar_html_varios(template, comprovantes):
+    # Um único documento com vários comprovantes; comprovantes: [(funcionario, empresa, itens, data_hoje)]
+    partes = [template.inicio_documento]
+    for n, (funcionario, empresa, itens, data_hoje) in enumerate(comprovantes):
+        # O id marca a página onde cada comprovante começa (ver gerar_pdf_combinado)
+        partes.append(f'<div class="comprovante" id="comprovante-{n}">')
+        partes.append(template.preencher(_valores(funcionario, empresa, itens, data_hoje), template.segmentos_corpo))
+        partes.append("</div>")
+    partes.append(template.fim_documento)
+    return "".join(partes)
+
+
+def gerar_pdf(template, html_final, filename, base_url):
+    from weasyprint import HTML
+
+    css, fontes = template.folha_estilo(base_url)
+    # Layout e gravação separados para medir cada fase
+    with metricas.span("layout_pdf"):
+        documento = HTML(string=html_final, base_url=base_url).render(stylesheets=[css], font_config=fontes)
+    with metricas.span("gravar_pdf", paginas=len(documento.pages)):
+        documento.write_pdf(filename, **opcoes_pdf)
+
+
+def renderizar_pdf(template, html_final, base_url):
+    # Igual a gerar_pdf, mas devolve os bytes do PDF em vez de gravar em arquivo
+    from weasyprint import HTML
+
+    css, fontes = template.folha_estilo(base_url)
+    with metricas.span("layout_pdf"):
+        documento = HTML(string=html_final, base_url=base_url).render(stylesheets=[css], font_config=fontes)
+    with metricas.span("gravar_pdf", paginas=len(documento.pages)):
+        return documento.write_pdf(**opcoes_pdf)
+
+
+def _paginas_por_comprovante(documento):
+    # Intervalos de páginas de cada comprovante de um bloco, pela página onde está o id de cada um
+    inicios = [n for n, pagina in enumerate(documento.pages)
+               if any(ancora.startswith("comprovante-") for ancora in pagina.anchors)]
+    return list(zip(inicios, inicios[1:] + [len(documento.pages)]))
+
+
+def gerar_pdf_combinado(template, comprovantes, filename, base_url, por_bloco=25, separado=None):
+    # Vários comprovantes em um único PDF. A diagramação é feita em blocos (o HTML de
+    # cada bloco é descartado após a diagramação, ficando só as páginas), com a
+    # mesma folha de estilo e fontes, e o PDF final é gravado direto no arquivo.
+    # separado(indice, bytes) recebe também o PDF de cada comprovante sozinho, feito
+    # com as páginas já diagramadas (sem diagramar de novo).
+    from weasyprint import HTML
+
+    estilos, fontes = template.folha_estilo_combinado(base_url)
+    documentos = []
+    for i in range(0, len(comprovantes), por_bloco):
+        html_bloco = montar_html_varios(template, comprovantes[i:i + por_bloco])
+        with metricas.span("layout_pdf", comprovantes=len(comprovantes[i:i + por_bloco])):
+            documento = HTML(string=html_bloco, base_url=base_url).render(stylesheets=estilos, font_config=fontes)
+        documentos.append(documento)
+        if separado is not None:
+            for n, (inicio, fim) in enumerate(_paginas_por_comprovante(documento)):
+                separado(i + n, documento.copy(documento.pages[inicio:fim]).write_pdf(**opcoes_pdf))
+    if not documentos:
+        return 0
+    paginas = [pagina for documento in documentos for pagina in documento.pages]
+    with metricas.span("gravar_pdf", paginas=len(paginas)):
+        documentos[0].copy(paginas).write_pdf(filename, **opcoes_pdf)
+    return len(paginas)
+
+
+def nome_base(funcionario, cnpj, data):
+    # Nome de arquivo sem acentos/espaços: Comprovante_EPI_<funcionario>_<cnpj>_<data>
+    base = unicodedata.normalize("NFKD", funcionario).encode("ascii", "ignore").decode("ascii")
+    base = re.sub(r"[^A-Za-z0-9]+", "_", base).strip("_") or "funcionario"
+    digitos = re.sub(r"\D", "", cnpj)
+    return f"Comprovante_EPI_{base}_{digitos}_{data}" if digitos else f"Comprovante_EPI_{base}_{data}"
@@ -0,0 +1,227 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Fila local (SQLite) das baixas de estoque no Omie.
+# Cada ajuste é gravado antes de ser enviado, com uma chave de idempotência
+# (confirmação da entrega + funcionário + data + item): reenviar a mesma confirmação
+# não duplica a baixa, mas uma nova entrega do mesmo item sempre entra na fila. Uma thread em segundo plano envia os pendentes
+# em lotes e continua de onde parou se o app for fechado.
+
+# As credenciais da API não são gravadas na fila; são incluídas no envio
+_campos_credenciais = ("app_key", "app_secret")
+
+PENDENTE = "pendente"
+# Lote em envio: gravado antes do POST, para uma baixa interrompida no meio (app
+# fechado, queda de energia) não voltar como pendente e ser lançada de novo
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+ERRO = "erro"
+# Baixa com erro que o operador decidiu não reenviar
+DESCARTADO = "descartado"
+# Sem resposta depois do envio: a baixa pode ter sido feita no Omie. Não é reenviada
+# sozinha; precisa ser conferida e então reenviada ou dada como lançada.
+INCERTO = "incerto"
+
+
+def chave_ajuste(funcionario, cnpj, data, cod_int, confirmacao=""):
+    # confirmacao: identificador gerado uma única vez por entrega confirmada
+    base = f"{confirmacao}|{cnpj}|{funcionario.upper()}|{data}|{cod_int}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def _sem_credenciais(payload):
+    return {k: v for k, v in payload.items() if k not in _campos_credenciais}
+
+
+class FilaAjustes:
+
+    def __init__(self, caminho):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ajustes (
+                chave TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                proxima_tentativa REAL NOT NULL DEFAULT 0,
+                mensagem TEXT NOT NULL DEFAULT '',
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ajustes_status ON ajustes (status, proxima_tentativa)")
+        # Envios interrompidos na execução anterior podem ter chegado ao Omie: vão para conferência
+        self._conn.execute(
+            "UPDATE ajustes SET status = ?, mensagem = ?, atualizado_em = ? WHERE status = ?",
+            (INCERTO, "Envio interrompido (app fechado durante a baixa)", time.time(), ENVIANDO)
+        )
+        self._conn.commit()
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+    def registrar(self, ajustes):
+        # ajustes: lista de (chave, payload). Chaves já registradas são ignoradas.
+        agora = time.time()
+        with self._lock, self._conn:
+            antes = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO ajustes (chave, payload, status, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+                [(chave, json.dumps(_sem_credenciais(payload)), PENDENTE, agora, agora) for chave, payload in ajustes]
+            )
+            return self._conn.total_changes - antes
+
+    def proximos(self, limite):
+        # Reserva (status ENVIANDO) e devolve os próximos pendentes
+        agora = time.time()
+        with self._lock, self._conn:
+            linhas = self._conn.execute(
+                "SELECT chave, payload, tentativas FROM ajustes WHERE status = ? AND proxima_tentativa <= ? "
+                "ORDER BY criado_em LIMIT ?",
+                (PENDENTE, agora, limite)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE ajustes SET status = ?, atualizado_em = ? WHERE chave = ?",
+                [(ENVIANDO, agora, chave) for chave, _, _ in linhas]
+            )
+        return [(chave, json.loads(payload), tentativas) for chave, payload, tentativas in linhas]
+
+    def marcar(self, atualizacoes):
+        # atualizacoes: lista de (chave, status, mensagem, proxima_tentativa)
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE ajustes SET status = ?, mensagem = ?, proxima_tentativa = ?, "
+                "tentativas = tentativas + 1, atualizado_em = ? WHERE chave = ?",
+                [(status, mensagem, proxima, agora, chave) for chave, status, mensagem, proxima in atualizacoes]
+            )
+
+    def contagem(self):
+        with self._lock:
+            linhas = self._conn.execute("SELECT status, COUNT(*) FROM ajustes GROUP BY status").fetchall()
+        return dict(linhas)
+
+    def _listar(self, status):
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT chave, payload, mensagem, atualizado_em FROM ajustes WHERE status = ? ORDER BY atualizado_em",
+                (status,)
+            ).fetchall()
+        return [(chave, json.loads(payload), mensagem, quando) for chave, payload, mensagem, quando in linhas]
+
+    def _mudar_status(self, chaves, de, para):
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE ajustes SET status = ?, proxima_tentativa = 0, atualizado_em = ? WHERE chave = ? AND status = ?",
+                [(para, agora, chave, de) for chave in chaves]
+            )
+
+    def erros(self):
+        return self._listar(ERRO)
+
+    def incertos(self):
+        return self._listar(INCERTO)
+
+    def resolver_erros(self, chaves, reenviar):
+        # Depois de corrigir a causa (ex: produto cadastrado no Omie): reenviar=True volta
+        # para a fila, False descarta a baixa
+        self._mudar_status(chaves, ERRO, PENDENTE if reenviar else DESCARTADO)
+
+    def resolver_incertos(self, chaves, reenviar):
+        # Depois de conferir no Omie: reenviar=True volta para a fila, False dá a baixa como lançada
+        self._mudar_status(chaves, INCERTO, PENDENTE if reenviar else ENVIADO)
+
+
+class DrenadorAjustes:
+
+    def __init__(self, fila, cliente, lote=20, intervalo=5.0, espera_maxima=300.0):
+        self.fila = fila
+        self.cliente = cliente
+        self.lote = lote
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="DrenadorAjustes", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self, timeout=5.0):
+        # Devolve False se a thread ainda está enviando um lote (a fila não deve ser fechada)
+        self._parar.set()
+        self._acordar.set()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def drenar(self):
+        # Envia um lote de pendentes; devolve quantos foram processados
+        pendentes = self.fila.proximos(self.lote)
+        if not pendentes:
+            return 0
+        try:
+            resultados = self.cliente.incluir_ajustes([
+                dict(payload, app_key=self.cliente.app_key, app_secret=self.cliente.app_secret)
+                for _, payload, _ in pendentes
+            ])
+        except Exception as e:
+            # Não se sabe o que chegou ao Omie: o lote vai para conferência
+            self.fila.marcar([(chave, INCERTO, str(e), 0) for chave, _, _ in pendentes])
+            raise
+        agora = time.time()
+        atualizacoes = []
+        for (chave, _, tentativas), r in zip(pendentes, resultados):
+            if r.ok:
+                atualizacoes.append((chave, ENVIADO, "", 0))
+            elif r.incerto:
+                # Pode ter sido lançada: não reenviar sem conferência
+                atualizacoes.append((chave, INCERTO, r.mensagem, 0))
+            elif r.transitorio:
+                # Continua pendente, com espera crescente até a próxima rodada
+                espera = min(self.espera_maxima, self.intervalo * (2 ** tentativas))
+                atualizacoes.append((chave, PENDENTE, r.mensagem, agora + espera))
+            else:
+                atualizacoes.append((chave, ERRO, r.mensagem, 0))
+        self.fila.marcar(atualizacoes)
+        return len(pendentes)
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                processados = self.drenar()
+            except Exception:
+                processados = 0
+            if processados < self.lote:
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
@@ -0,0 +1,197 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import csv
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Histórico local (SQLite) das entregas de EPIs: uma linha por item entregue.
+# Os índices cobrem as consultas por funcionário, por item e por período.
+
+_formato_data = "%Y-%m-%d %H:%M:%S"
+
+_sql_inserir = (
+    "INSERT INTO entregas (funcionario, cnpj, empresa, codigo, descricao, quantidade, entregue_em, pdf, confirmacao) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_sql_ultima = (
+    "INSERT INTO ultimas_entregas (cnpj, funcionario, codigo, empresa, descricao, entregue_em) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (cnpj, funcionario, codigo) DO UPDATE SET "
+    "empresa = excluded.empresa, descricao = excluded.descricao, entregue_em = excluded.entregue_em "
+    "WHERE excluded.entregue_em >= ultimas_entregas.entregue_em"
+)
+
+_colunas = ("funcionario", "cnpj", "empresa", "codigo", "descricao", "quantidade", "entregue_em", "pdf")
+
+
+class Historico:
+
+    def __init__(self, caminho):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entregas (
+                    id INTEGER PRIMARY KEY,
+                    funcionario TEXT NOT NULL,
+                    cnpj TEXT NOT NULL,
+                    empresa TEXT NOT NULL,
+                    codigo TEXT NOT NULL,
+                    descricao TEXT NOT NULL,
+                    quantidade INTEGER NOT NULL,
+                    entregue_em TEXT NOT NULL,
+                    pdf TEXT NOT NULL DEFAULT '',
+                    -- Identificador da confirmação da entrega (para anexar o PDF depois de gerado)
+                    confirmacao TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entregas_confirmacao ON entregas (confirmacao)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entregas_funcionario ON entregas (cnpj, funcionario, entregue_em)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entregas_item ON entregas (codigo, entregue_em)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entregas_data ON entregas (entregue_em)")
+            # Última entrega de cada item por funcionário, mantida a cada registro (relatório de troca)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ultimas_entregas (
+                    cnpj TEXT NOT NULL,
+                    funcionario TEXT NOT NULL,
+                    codigo TEXT NOT NULL,
+                    empresa TEXT NOT NULL,
+                    descricao TEXT NOT NULL,
+                    entregue_em TEXT NOT NULL,
+                    PRIMARY KEY (cnpj, funcionario, codigo)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_ultimas_data ON ultimas_entregas (entregue_em)")
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+    def registrar(self, funcionario, cnpj, empresa, itens, pdf="", entregue_em=None, confirmacao=""):
+        # itens: lista de (codigo, descricao, quantidade), gravados numa única transação
+        quando = (entregue_em or datetime.now()).strftime(_formato_data)
+        linhas = [
+            (funcionario, cnpj, empresa, str(cod), desc, int(qtd), quando, pdf, confirmacao)
+            for cod, desc, qtd in itens
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(_sql_inserir, linhas)
+            self._conn.executemany(_sql_ultima, [
+                (cnpj, funcionario, codigo, empresa, descricao, quando)
+                for funcionario, cnpj, empresa, codigo, descricao, _, quando, _, _ in linhas
+            ])
+        return len(linhas)
+
+    def definir_pdf(self, confirmacao, pdf):
+        # Anexa o PDF às linhas de uma entrega registrada antes da geração do comprovante
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE entregas SET pdf = ? WHERE confirmacao = ?", (pdf, confirmacao)
+            ).rowcount
+
+    def _consultar(self, sql, parametros):
+        with self._lock:
+            cursor = self._conn.execute(sql, parametros)
+            return [dict(zip(_colunas, linha)) for linha in cursor.fetchall()]
+
+    @staticmethod
+    def _periodo(desde, ate):
+        desde = (desde or datetime(1970, 1, 1)).strftime(_formato_data)
+        ate = (ate or datetime(9999, 12, 31)).strftime(_formato_data)
+        return desde, ate
+
+    def por_funcionario(self, funcionario, cnpj, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join(_colunas)} FROM entregas "
+            "WHERE cnpj = ? AND funcionario = ? AND entregue_em BETWEEN ? AND ? "
+            "ORDER BY entregue_em DESC",
+            (cnpj, funcionario, desde, ate)
+        )
+
+    def por_item(self, codigo, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join(_colunas)} FROM entregas "
+            "WHERE codigo = ? AND entregue_em BETWEEN ? AND ? "
+            "ORDER BY entregue_em DESC",
+            (str(codigo), desde, ate)
+        )
+
+    def por_periodo(self, desde=None, ate=None):
+        desde, ate = self._periodo(desde, ate)
+        return self._consultar(
+            f"SELECT {', '.join(_colunas)} FROM entregas "
+            "WHERE entregue_em BETWEEN ? AND ? ORDER BY entregue_em DESC",
+            (desde, ate)
+        )
+
+    def ultimos_doze_meses(self, funcionario, cnpj):
+        return self.por_funcionario(funcionario, cnpj, desde=datetime.now() - timedelta(days=365))
+
+    def para_troca(self, dias, validade_por_codigo=None, hoje=None):
+        # Última entrega de cada EPI por funcionário, quando já passou do prazo de troca.
+        # dias: prazo padrão; validade_por_codigo: {codigo: dias} para prazos específicos.
+        validade_por_codigo = validade_por_codigo or {}
+        hoje = hoje or datetime.now()
+        menor_prazo = min([dias] + list(validade_por_codigo.values()))
+        limite = (hoje - timedelta(days=menor_prazo)).strftime(_formato_data)
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT funcionario, cnpj, empresa, codigo, descricao, entregue_em "
+                "FROM ultimas_entregas WHERE entregue_em <= ? ORDER BY funcionario, codigo",
+                (limite,)
+            ).fetchall()
+
+        vencidos = []
+        for funcionario, cnpj, empresa, codigo, descricao, ultima in linhas:
+            prazo = validade_por_codigo.get(codigo, dias)
+            vence_em = datetime.strptime(ultima, _formato_data) + timedelta(days=prazo)
+            if vence_em <= hoje:
+                vencidos.append({
+                    "funcionario": funcionario, "cnpj": cnpj, "empresa": empresa,
+                    "codigo": codigo, "descricao": descricao,
+                    "ultima_entrega": ultima, "vence_em": vence_em.strftime(_formato_data),
+                })
+        return vencidos
+
+
+def exportar_csv(linhas, destino):
+    # destino: caminho ou arquivo já aberto (ex: sys.stdout)
+    if not linhas:
+        return 0
+    if hasattr(destino, "write"):
+        escritor = csv.DictWriter(destino, fieldnames=list(linhas[0]), delimiter=";")
+        escritor.writeheader()
+        escritor.writerows(linhas)
+    else:
+        with open(destino, "w", encoding="utf-8", newline="") as f:
+            exportar_csv(linhas, f)
+    return len(linhas)
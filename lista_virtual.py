@@ -0,0 +1,308 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from busca import IndiceBusca
+
+# Lista virtual sobre um ttk.Treeview: os dados ficam em memória (self.linhas) e
+# o widget só mantém as linhas da área visível (mais uma pequena folga), que são
+# reaproveitadas e preenchidas de novo a cada rolagem. A seleção é guardada por
+# índice de dado, então continua valendo para linhas fora da tela.
+# Como no Treeview comum, um clique simples numa linha deixa só ela selecionada (em
+# toda a lista, inclusive nas linhas fora da tela ou escondidas pela busca); com
+# Ctrl/Shift, as demais são mantidas.
+
+# Shift e Control no event.state (no macOS, Command é o Mod1)
+_modificadores = 0x0001 | 0x0004
+_modificadores_aqua = _modificadores | 0x0008
+
+
+class ListaVirtual:
+
+    def __init__(self, tree, scrollbar, overscan=3, marcacao=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.overscan = overscan
+        # (tag_marcada, tag_desmarcada) para listas com checkbox na coluna #0
+        self.marcacao = marcacao
+
+        self.linhas = []
+        self.visiveis = []
+        self.selecionados = set()
+        self.topo = 0
+
+        self._slots = []
+        self._indices_slots = []
+        self._exibido = {}
+        self._clique_simples = False
+
+        self.scrollbar.configure(command=self._rolar_scrollbar)
+        self.tree.configure(yscrollcommand=lambda *args: None)
+
+        self.tree.bind("<ButtonPress-1>", self._ao_clicar, add="+")
+        self.tree.bind("<<TreeviewSelect>>", self._ao_selecionar, add="+")
+        self.tree.bind("<Configure>", lambda e: self.atualizar(), add="+")
+        self.tree.bind("<MouseWheel>", self._roda_mouse)
+        self.tree.bind("<Button-4>", lambda e: self.rolar(-3))
+        self.tree.bind("<Button-5>", lambda e: self.rolar(3))
+        self.tree.bind("<Up>", lambda e: self._mover_foco(-1))
+        self.tree.bind("<Down>", lambda e: self._mover_foco(1))
+        self.tree.bind("<Prior>", lambda e: self.rolar(-self._linhas_na_tela()))
+        self.tree.bind("<Next>", lambda e: self.rolar(self._linhas_na_tela()))
+
+    # ---- Dados ----
+
+    def definir_linhas(self, linhas):
+        self.linhas = [tuple(l) for l in linhas]
+        self.visiveis = list(range(len(self.linhas)))
+        self.selecionados = set()
+        self.topo = 0
+        self.atualizar()
+
+    def aplicar_diferenca(self, diferenca, chave, linhas=None):
+        # Aplica inserções, remoções e alterações (catalogo.Diferenca) sem recriar a lista;
+        # a seleção é mantida pela chave das linhas e só as linhas visíveis são redesenhadas.
+        # linhas: a versão nova completa, quando conhecida, para as inseridas ficarem na
+        # mesma posição da origem (ex: ordem alfabética); sem ela, entram no fim da lista.
+        selecionadas = {chave(self.linhas[i]) for i in self.selecionados}
+        if linhas is not None:
+            novas = [tuple(l) for l in linhas]
+        else:
+            novas = []
+            for linha in self.linhas:
+                k = chave(linha)
+                if k in diferenca.removidos:
+                    continue
+                novas.append(diferenca.alterados.get(k, linha))
+            novas.extend(tuple(l) for l in diferenca.inseridos)
+        self.linhas = novas
+        self.selecionados = {i for i, l in enumerate(novas) if chave(l) in selecionadas}
+        self.visiveis = list(range(len(novas)))
+        self.atualizar()
+
+    def filtrar(self, indices):
+        # Exibe apenas as linhas indicadas (None = todas); a seleção é mantida
+        self.visiveis = list(range(len(self.linhas))) if indices is None else indices
+        self.topo = 0
+        self.atualizar()
+
+    def selecao(self):
+        return sorted(self.selecionados)
+
+    def indice_do_item(self, item):
+        # Índice em self.linhas da linha do widget (ou None)
+        try:
+            return self._indices_slots[self._slots.index(item)]
+        except ValueError:
+            return None
+
+    # ---- Seleção ----
+
+    def alternar(self, indice):
+        if indice in self.selecionados:
+            self.selecionados.discard(indice)
+        else:
+            self.selecionados.add(indice)
+        self.atualizar()
+
+    def limpar_selecao(self):
+        self.selecionados = set()
+        self.atualizar()
+
+    def _ao_clicar(self, event):
+        # Anota se o próximo <<TreeviewSelect>> vem de um clique simples numa linha
+        # (fora da coluna do checkbox, que é tratada pela tela)
+        aqua = self.tree.tk.call("tk", "windowingsystem") == "aqua"
+        self._clique_simples = (
+            not event.state & (_modificadores_aqua if aqua else _modificadores)
+            and bool(self.tree.identify_row(event.y))
+            and not (self.marcacao and self.tree.identify_column(event.x) == "#0")
+        )
+
+    def _ao_selecionar(self, event):
+        sel = set(self.tree.selection())
+        if self._clique_simples:
+            # Clique simples: a seleção do widget passa a ser a seleção de toda a lista
+            self._clique_simples = False
+            novos = {indice for slot, indice in zip(self._slots, self._indices_slots) if slot in sel}
+            if novos != self.selecionados:
+                self.selecionados = novos
+                self.atualizar()
+            return
+        # Ctrl/Shift e seleção pelo código: aplica só a diferença entre o widget e o modelo, nas linhas exibidas
+        adicionados = set()
+        removidos = set()
+        for slot, indice in zip(self._slots, self._indices_slots):
+            if slot in sel:
+                if indice not in self.selecionados:
+                    adicionados.add(indice)
+            elif indice in self.selecionados:
+                removidos.add(indice)
+        if adicionados and str(self.tree.cget("selectmode")) == "browse":
+            removidos |= self.selecionados - adicionados
+        if not adicionados and not removidos:
+            return
+        self.selecionados |= adicionados
+        self.selecionados -= removidos
+        self.atualizar()
+
+    # ---- Rolagem ----
+
+    def _linhas_na_tela(self):
+        altura_linha = int(ttk.Style(self.tree).lookup("Treeview", "rowheight") or 20)
+        altura = self.tree.winfo_height()
+        if altura <= 1:
+            return int(self.tree.cget("height"))
+        return max(1, altura // altura_linha)
+
+    def rolar(self, linhas):
+        self.topo += linhas
+        self.atualizar()
+        return "break"
+
+    def _roda_mouse(self, event):
+        passo = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self.rolar(passo * 3)
+
+    def _rolar_scrollbar(self, acao, valor, unidade=None):
+        if acao == "moveto":
+            self.topo = int(float(valor) * len(self.visiveis))
+            self.atualizar()
+        elif acao == "scroll":
+            passo = int(valor)
+            if unidade == "pages":
+                passo *= self._linhas_na_tela()
+            self.rolar(passo)
+
+    def _mover_foco(self, passo):
+        if not self.visiveis:
+            return "break"
+        indice = self.indice_do_item(self.tree.focus())
+        try:
+            pos = self.visiveis.index(indice) + passo if indice is not None else self.topo
+        except ValueError:
+            pos = self.topo
+        pos = max(0, min(len(self.visiveis) - 1, pos))
+
+        n = self._linhas_na_tela()
+        if pos < self.topo:
+            self.topo = pos
+        elif pos >= self.topo + n:
+            self.topo = pos - n + 1
+
+        # Mesmo comportamento padrão do Treeview: as setas selecionam apenas a nova linha
+        self.selecionados = {self.visiveis[pos]}
+        self.atualizar()
+        self.tree.focus(self._slots[pos - self.topo])
+        return "break"
+
+    # ---- Desenho ----
+
+    def _tags(self, indice):
+        if not self.marcacao:
+            return ()
+        return (self.marcacao[0],) if indice in self.selecionados else (self.marcacao[1],)
+
+    def atualizar(self):
+        total = len(self.visiveis)
+        n = self._linhas_na_tela()
+        self.topo = max(0, min(self.topo, total - n))
+        janela = self.visiveis[self.topo:self.topo + n + self.overscan]
+
+        while len(self._slots) < len(janela):
+            self._slots.append(self.tree.insert("", "end"))
+        while len(self._slots) > len(janela):
+            slot = self._slots.pop()
+            self._exibido.pop(slot, None)
+            self.tree.delete(slot)
+
+        # Só reescreve as linhas do widget cujo conteúdo mudou
+        selecionar = []
+        for slot, indice in zip(self._slots, janela):
+            tags = self._tags(indice)
+            estado = (indice, self.linhas[indice], tags)
+            if self._exibido.get(slot) != estado:
+                self.tree.item(slot, values=self.linhas[indice], tags=tags)
+                self._exibido[slot] = estado
+            if indice in self.selecionados:
+                selecionar.append(slot)
+        self._indices_slots = janela
+
+        if set(selecionar) != set(self.tree.selection()):
+            self.tree.selection_set(selecionar)
+        self.tree.yview_moveto(0)
+        if total:
+            self.scrollbar.set(self.topo / total, min(1.0, (self.topo + n) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+
+class CampoBusca:
+
+    # Campo de busca acima de uma ListaVirtual. O índice é montado em segundo plano
+    # na carga dos dados e o filtro é aplicado com atraso (debounce) a cada tecla.
+
+    def __init__(self, parent, lista, colunas, atraso=120, bg="#f0f0f0"):
+        self.lista = lista
+        self.colunas = colunas
+        self.atraso = atraso
+        self.indice = None
+        self._agendado = None
+
+        frame = tk.Frame(parent, bg=bg)
+        frame.pack(side=tk.TOP, fill=tk.X, padx=10, before=lista.tree)
+        tk.Label(frame, text="Buscar:", bg=bg, font=("Helvetica", 11)).pack(side=tk.LEFT)
+        self.var = tk.StringVar()
+        self.entry = ttk.Entry(frame, textvariable=self.var, font=("Helvetica", 11))
+        self.entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        self.entry.bind("<Escape>", lambda e: self.var.set(""))
+        self.var.trace_add("write", lambda *args: self.agendar())
+
+    def indexar(self, linhas):
+        self.indice = None
+        threading.Thread(target=self._montar_indice, args=(linhas,), daemon=True).start()
+        if self.var.get().strip():
+            self.agendar()
+
+    def _montar_indice(self, linhas):
+        indice = IndiceBusca(linhas, self.colunas)
+        # Descarta o índice se os dados da lista foram trocados enquanto era montado
+        if linhas is self.lista.linhas:
+            self.indice = indice
+
+    def agendar(self, atraso=None):
+        if self._agendado:
+            self.entry.after_cancel(self._agendado)
+        self._agendado = self.entry.after(self.atraso if atraso is None else atraso, self.aplicar)
+
+    def aplicar(self):
+        self._agendado = None
+        texto = self.var.get()
+        if not texto.strip():
+            self.lista.filtrar(None)
+            return
+        if self.indice is None:
+            # Índice ainda em montagem: tenta de novo em seguida
+            self.agendar(100)
+            return
+        self.lista.filtrar(self.indice.buscar(texto))
@@ -0,0 +1,167 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+import catalogo
+import comprovante
+import motor
+
+# Geração em lote (sem interface): um PDF por funcionário, renderizado em paralelo
+
+# Caminho do template e base_url de cada processo do pool (o template compilado
+# fica no cache de comprovante, então é lido uma única vez por processo)
+_template_worker = None
+_base_url_worker = None
+
+
+def ler_entregas(caminho):
+    # Arquivo de entregas (separador ";"): funcionario;codigo;quantidade, com coluna cnpj opcional
+    df = pd.read_csv(caminho, sep=";", encoding="utf-8", dtype=str)
+    colunas = {"funcionario", "codigo", "quantidade"}
+    faltando = colunas - set(df.columns)
+    if faltando:
+        raise ValueError(f"Arquivo de entregas sem a(s) coluna(s): {', '.join(sorted(faltando))}")
+    if "cnpj" not in df.columns:
+        df["cnpj"] = ""
+    df = df.dropna(subset=["funcionario", "codigo", "quantidade"]).fillna("")
+    return [
+        (str(r.funcionario).strip(), str(r.cnpj).strip(), str(r.codigo).strip(), str(r.quantidade).strip())
+        for r in df.itertuples(index=False)
+    ]
+
+
+def agrupar_entregas(entregas, funcionarios, epis, data=None):
+    # Resolve empresa/CNPJ e descrição pelos cadastros e agrupa os itens por funcionário
+    cadastro = motor.Catalogo(funcionarios, epis)
+
+    grupos = {}
+    erros = []
+    for linha, (nome, cnpj, codigo, quantidade) in enumerate(entregas, start=2):
+        try:
+            funcionario = cadastro.funcionario(nome, cnpj)
+            item = cadastro.item(codigo, quantidade)
+        except motor.ErroEntrega as e:
+            erros.append(f"Linha {linha}: {str(e)}")
+            continue
+        grupos.setdefault(funcionario, []).append(item)
+
+    lotes = [motor.montar_entrega(funcionario, itens, data) for funcionario, itens in grupos.items()]
+    return lotes, erros
+
+
+def nome_arquivo(funcionario, cnpj, data, usados):
+    nome = comprovante.nome_base(funcionario, cnpj, data)
+    candidato = nome
+    n = 2
+    while candidato in usados:
+        candidato = f"{nome}_{n}"
+        n += 1
+    usados.add(candidato)
+    return candidato + ".pdf"
+
+
+def _iniciar_worker(template_path, base_url):
+    global _template_worker, _base_url_worker
+    _template_worker = template_path
+    _base_url_worker = base_url
+
+
+def _renderizar(entrega, filename):
+    return motor.renderizar(entrega, _template_worker, filename, _base_url_worker)
+
+
+def _preparar(entregas_path, funcionarios_path, estoque_path, data):
+    return agrupar_entregas(
+        ler_entregas(entregas_path),
+        catalogo.ler_funcionarios(funcionarios_path),
+        catalogo.ler_epis(estoque_path),
+        data,
+    )
+
+
+def gerar_lote(entregas_path, funcionarios_path, estoque_path, template_path, saida_dir, base_url, processos=None,
+               historico=None, acervo=None):
+    agora = datetime.now()
+    lotes, erros = _preparar(entregas_path, funcionarios_path, estoque_path, agora)
+
+    os.makedirs(saida_dir, exist_ok=True)
+    data_arquivo = agora.strftime("%Y%m%d")
+    usados = {os.path.splitext(f)[0] for f in os.listdir(saida_dir)}
+
+    gerados = []
+    processos = processos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker,
+                             initargs=(template_path, base_url)) as pool:
+        futuros = {}
+        for entrega in lotes:
+            f = entrega.funcionario
+            filename = os.path.join(saida_dir, nome_arquivo(f.nome, f.cnpj, data_arquivo, usados))
+            futuros[pool.submit(_renderizar, entrega, filename)] = entrega
+        for futuro in as_completed(futuros):
+            entrega = futuros[futuro]
+            try:
+                gerados.append(futuro.result())
+            except Exception as e:
+                erros.append(f"Erro ao gerar PDF de {entrega.funcionario.nome}: {str(e)}")
+                continue
+            pdf = gerados[-1]
+            if acervo is not None:
+                # No histórico fica o caminho no acervo: a pasta --saida pode ser apagada depois
+                pdf = motor.guardar_no_acervo(acervo, entrega, template_path, pdf)
+            if historico is not None:
+                motor.registrar_historico(historico, entrega, pdf)
+
+    return sorted(gerados), erros
+
+
+def gerar_lote_combinado(entregas_path, funcionarios_path, estoque_path, template_path, arquivo_pdf, base_url,
+                         historico=None, acervo=None):
+    # Todos os comprovantes em um único PDF (um comprovante por intervalo de páginas)
+    agora = datetime.now()
+    lotes, erros = _preparar(entregas_path, funcionarios_path, estoque_path, agora)
+
+    pasta = os.path.dirname(arquivo_pdf)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    template = comprovante.carregar_template(template_path)
+    comprovantes = [(e.funcionario.nome, e.funcionario.empresa, e.itens, e.data_comprovante) for e in lotes]
+
+    # O PDF combinado é só para impressão: cada comprovante também vai, sozinho, para o acervo
+    arquivados = {}
+
+    def arquivar(indice, dados):
+        entrega = lotes[indice]
+        try:
+            arquivados[indice] = motor.guardar_no_acervo(acervo, entrega, template_path, dados=dados)
+        except Exception as e:
+            erros.append(f"Erro ao guardar no acervo o comprovante de {entrega.funcionario.nome}: {str(e)}")
+
+    paginas = comprovante.gerar_pdf_combinado(template, comprovantes, arquivo_pdf, base_url,
+                                              separado=arquivar if acervo is not None else None)
+
+    if historico is not None:
+        for indice, entrega in enumerate(lotes):
+            motor.registrar_historico(historico, entrega, arquivados.get(indice, arquivo_pdf))
+    return len(lotes), paginas, erros
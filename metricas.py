@@ -0,0 +1,158 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# Medição das fases lentas (leitura dos CSVs, template, layout e gravação do PDF, abertura
+# do arquivo, chamadas ao Omie). Cada medida vai para um log JSON-lines com rotação e,
+# opcionalmente, para um arquivo texto no formato do Prometheus (node_exporter textfile).
+# As últimas amostras de cada fase ficam em memória para o painel de diagnóstico.
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    # Método do posto mais próximo
+    i = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[min(i, len(ordenados) - 1)]
+
+
+class Metricas:
+
+    def __init__(self, amostras=1000):
+        self.amostras = amostras
+        self._lock = threading.Lock()
+        self._tempos = {}
+        self._totais = {}
+        self._status = Counter()
+        self._log = None
+        self._prometheus = None
+        self._intervalo_prometheus = 15.0
+        self._ultima_exportacao = 0.0
+
+    def configurar(self, log=None, tamanho_max=5 * 1024 * 1024, arquivos=3, prometheus=None, intervalo_prometheus=15.0):
+        if self._log is not None:
+            for handler in list(self._log.handlers):
+                self._log.removeHandler(handler)
+                handler.close()
+            self._log = None
+        if log:
+            os.makedirs(os.path.dirname(os.path.abspath(log)), exist_ok=True)
+            handler = RotatingFileHandler(log, maxBytes=tamanho_max, backupCount=arquivos, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log = logging.getLogger(f"metricas.{id(self)}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.addHandler(handler)
+        self._prometheus = prometheus or None
+        self._intervalo_prometheus = intervalo_prometheus
+
+    @contextmanager
+    def span(self, fase, **atributos):
+        # Os atributos podem ser completados dentro do bloco (ex: status da resposta)
+        inicio = time.perf_counter()
+        try:
+            yield atributos
+        except BaseException as e:
+            atributos.setdefault("erro", type(e).__name__)
+            raise
+        finally:
+            self.registrar(fase, time.perf_counter() - inicio, **atributos)
+
+    def registrar(self, fase, duracao, **atributos):
+        status = atributos.get("status")
+        with self._lock:
+            tempos = self._tempos.get(fase)
+            if tempos is None:
+                tempos = self._tempos[fase] = deque(maxlen=self.amostras)
+            tempos.append(duracao)
+            n, soma = self._totais.get(fase, (0, 0.0))
+            self._totais[fase] = (n + 1, soma + duracao)
+            if status is not None:
+                self._status[(fase, str(status))] += 1
+            exportar = (self._prometheus is not None
+                        and time.monotonic() - self._ultima_exportacao >= self._intervalo_prometheus)
+            if exportar:
+                self._ultima_exportacao = time.monotonic()
+
+        if self._log is not None:
+            registro = {"ts": datetime.now().isoformat(timespec="milliseconds"), "fase": fase,
+                        "ms": round(duracao * 1000, 3)}
+            registro.update(atributos)
+            self._log.info(json.dumps(registro, ensure_ascii=False, default=str))
+        if exportar:
+            try:
+                self.exportar_prometheus()
+            except OSError:
+                pass
+
+    def resumo(self):
+        # [(fase, amostras, p50, p95, máximo)] em segundos, das últimas amostras de cada fase
+        with self._lock:
+            copias = {fase: sorted(tempos) for fase, tempos in self._tempos.items()}
+        return [
+            (fase, len(t), percentil(t, 50), percentil(t, 95), t[-1])
+            for fase, t in sorted(copias.items())
+        ]
+
+    def contagem_status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def exportar_prometheus(self, caminho=None):
+        caminho = caminho or self._prometheus
+        if not caminho:
+            return
+        with self._lock:
+            totais = dict(self._totais)
+            status = dict(self._status)
+        linhas = [
+            "# HELP epis_fase_segundos Duração das fases da geração de comprovantes e da baixa no Omie.",
+            "# TYPE epis_fase_segundos summary",
+        ]
+        for fase, _, p50, p95, _ in self.resumo():
+            n, soma = totais[fase]
+            linhas.append(f'epis_fase_segundos{{fase="{fase}",quantile="0.5"}} {p50:.6f}')
+            linhas.append(f'epis_fase_segundos{{fase="{fase}",quantile="0.95"}} {p95:.6f}')
+            linhas.append(f'epis_fase_segundos_sum{{fase="{fase}"}} {soma:.6f}')
+            linhas.append(f'epis_fase_segundos_count{{fase="{fase}"}} {n}')
+        linhas.append("# HELP epis_fase_status_total Resultados por fase (ex: status HTTP das chamadas ao Omie).")
+        linhas.append("# TYPE epis_fase_status_total counter")
+        for (fase, codigo), n in sorted(status.items()):
+            linhas.append(f'epis_fase_status_total{{fase="{fase}",status="{codigo}"}} {n}')
+
+        # Grava em arquivo temporário e troca, para o coletor nunca ler um arquivo pela metade
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+        os.replace(temporario, caminho)
+
+
+# Instância usada pelo app e pelos módulos; sem configurar, guarda só as amostras em memória
+metricas = Metricas()
@@ -0,0 +1,284 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import uuid
+from datetime import datetime
+
+import catalogo
+import comprovante
+from acervo import chave_conteudo
+from fila_ajustes import chave_ajuste
+
+# Regras da entrega de EPIs sem interface: leitura dos cadastros, validação das
+# quantidades, baixa no Omie, geração do comprovante e registro no histórico.
+# Usado pela tela (app.py), pelo modo lote e por scripts/serviços, sem precisar do Tk.
+#
+#   cat = motor.carregar(funcionarios_path, estoque_path)
+#   entrega = motor.montar_entrega(cat.funcionario("JOÃO DA SILVA"), [cat.item("1234", 2)])
+#   motor.entregar(entrega, template_path, "comprovante.pdf", base_dir, fila=fila, cliente=cliente)
+
+
+class ErroEntrega(ValueError):
+    pass
+
+
+class _Registro:
+
+    # Registros leves (__slots__) que também se comportam como as tuplas usadas no
+    # restante do app: funcionario, empresa, cnpj = f / cod, desc, qtd = item
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return (getattr(self, campo) for campo in self.__slots__)
+
+    def __eq__(self, outro):
+        return type(outro) is type(self) and tuple(self) == tuple(outro)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        campos = ", ".join(f"{campo}={getattr(self, campo)!r}" for campo in self.__slots__)
+        return f"{type(self).__name__}({campos})"
+
+
+class Funcionario(_Registro):
+
+    __slots__ = ("nome", "empresa", "cnpj")
+
+    def __init__(self, nome: str, empresa: str = "", cnpj: str = ""):
+        self.nome = str(nome).strip()
+        self.empresa = str(empresa).strip()
+        self.cnpj = str(cnpj).strip()
+
+    @property
+    def chave(self):
+        return catalogo.chave_funcionario((self.nome, self.empresa, self.cnpj))
+
+
+class Item(_Registro):
+
+    __slots__ = ("codigo", "descricao", "quantidade")
+
+    def __init__(self, codigo, descricao: str, quantidade: int = 1):
+        self.codigo = str(codigo).strip()
+        self.descricao = str(descricao)
+        self.quantidade = int(quantidade)
+
+
+class Entrega(_Registro):
+
+    __slots__ = ("funcionario", "itens", "data", "confirmacao")
+
+    def __init__(self, funcionario: Funcionario, itens, data: datetime = None, confirmacao: str = None):
+        self.funcionario = funcionario
+        self.itens = tuple(itens)
+        self.data = data or datetime.now()
+        # Identifica esta confirmação (chave das baixas na fila e das linhas do histórico)
+        self.confirmacao = confirmacao or uuid.uuid4().hex
+
+    @property
+    def data_comprovante(self):
+        return self.data.strftime("%d/%m/%Y")
+
+    @property
+    def data_arquivo(self):
+        return self.data.strftime("%Y%m%d")
+
+
+# ---- Cadastros ----
+
+class Catalogo:
+
+    # Linhas dos CSVs (tuplas, como usadas pelas listas da tela) com busca por nome/código
+
+    def __init__(self, funcionarios, epis):
+        self.funcionarios = funcionarios
+        self.epis = epis
+        self._por_nome = None
+        self._descricoes = None
+
+    def funcionario(self, nome, cnpj=""):
+        if self._por_nome is None:
+            por_nome = {}
+            for linha in self.funcionarios:
+                por_nome.setdefault(linha[0].upper(), []).append(linha)
+            self._por_nome = por_nome
+        candidatos = self._por_nome.get(str(nome).strip().upper(), [])
+        if cnpj:
+            candidatos = [c for c in candidatos if c[2] == cnpj]
+        if not candidatos:
+            raise ErroEntrega(f"funcionário {nome} não encontrado")
+        if len(candidatos) > 1:
+            raise ErroEntrega(f"funcionário {nome} ambíguo (informe o cnpj)")
+        return Funcionario(*candidatos[0])
+
+    def item(self, codigo, quantidade=1):
+        if self._descricoes is None:
+            self._descricoes = dict(self.epis)
+        codigo = str(codigo).strip()
+        if codigo not in self._descricoes:
+            raise ErroEntrega(f"EPI {codigo} não encontrado no estoque")
+        return Item(codigo, self._descricoes[codigo], validar_quantidade(quantidade))
+
+
+def carregar(funcionarios_path, estoque_path, usar_cache=True):
+    return Catalogo(
+        catalogo.ler_funcionarios(funcionarios_path, usar_cache),
+        catalogo.ler_epis(estoque_path, usar_cache),
+    )
+
+
+# ---- Validação ----
+
+def validar_quantidade(valor, minimo=1):
+    try:
+        quantidade = int(str(valor).strip())
+    except ValueError:
+        raise ErroEntrega(f"quantidade inválida ({valor})")
+    if quantidade < minimo:
+        raise ErroEntrega(f"quantidade inválida ({valor})")
+    return quantidade
+
+
+def montar_entrega(funcionario, itens, data=None):
+    # Soma itens repetidos e descarta quantidades zeradas; exige ao menos um item
+    quantidades = {}
+    descricoes = {}
+    for item in itens:
+        if not isinstance(item, Item):
+            item = Item(*item)
+        if item.quantidade < 0:
+            raise ErroEntrega(f"quantidade inválida ({item.quantidade}) para o EPI {item.codigo}")
+        quantidades[item.codigo] = quantidades.get(item.codigo, 0) + item.quantidade
+        descricoes.setdefault(item.codigo, item.descricao)
+    itens = [Item(cod, descricoes[cod], qtd) for cod, qtd in quantidades.items() if qtd > 0]
+    if not itens:
+        raise ErroEntrega("Informe pelo menos uma quantidade maior que zero.")
+    if not isinstance(funcionario, Funcionario):
+        funcionario = Funcionario(*funcionario)
+    return Entrega(funcionario, itens, data)
+
+
+# ---- Baixa no Omie ----
+
+def _cod_int(codigo):
+    # Códigos numéricos seguem como número no cod_int, como sempre foram enviados
+    return int(codigo) if codigo.isdigit() else codigo
+
+
+def ajustes(entrega, cliente):
+    # [(chave, payload)] de IncluirAjusteEstoque, um por item
+    f = entrega.funcionario
+    data = entrega.data_comprovante
+    return [
+        (chave_ajuste(f.nome, f.cnpj, data, _cod_int(item.codigo), entrega.confirmacao),
+         cliente.montar_ajuste(_cod_int(item.codigo), item.quantidade, f.nome, data, data))
+        for item in entrega.itens
+    ]
+
+
+def enfileirar_baixa(fila, cliente, entrega):
+    # Grava as baixas na fila local (enviadas depois pelo DrenadorAjustes); devolve quantas são novas.
+    # Só a mesma entrega registrada de novo (mesma confirmacao) é ignorada.
+    return fila.registrar(ajustes(entrega, cliente))
+
+
+def ajustar_estoque(cliente, entrega):
+    # Envia as baixas direto ao Omie; devolve [ResultadoAjuste]
+    return cliente.incluir_ajustes([payload for _, payload in ajustes(entrega, cliente)])
+
+
+# ---- Comprovante e histórico ----
+
+def renderizar(entrega, template_path, filename, base_url):
+    f = entrega.funcionario
+    template = comprovante.carregar_template(template_path)
+    html_final = comprovante.montar_html(template, f.nome, f.empresa, entrega.itens, entrega.data_comprovante)
+    comprovante.gerar_pdf(template, html_final, filename, base_url)
+    return filename
+
+
+def _conteudo(entrega, template_path):
+    f = entrega.funcionario
+    template = comprovante.carregar_template(template_path)
+    html_final = comprovante.montar_html(template, f.nome, f.empresa, entrega.itens, entrega.data_comprovante)
+    return template, html_final, chave_conteudo(template, html_final)
+
+
+def arquivar(entrega, template_path, base_url, acervo, gerar=None):
+    # Gera o comprovante direto no acervo e devolve (caminho, novo). O mesmo comprovante
+    # pedido de novo (mesma entrega no mesmo dia, mesmo template) vem do acervo, sem renderizar.
+    # gerar(entrega) -> bytes substitui a renderização local (ex: servidor de PDFs); se
+    # devolver None, o PDF é gerado localmente.
+    f = entrega.funcionario
+    template, html_final, chave = _conteudo(entrega, template_path)
+    caminho = acervo.procurar(chave)
+    if caminho:
+        return caminho, False
+    dados = gerar(entrega) if gerar else None
+    if dados is None:
+        dados = comprovante.renderizar_pdf(template, html_final, base_url)
+    return acervo.guardar(chave, dados, f.nome, f.cnpj, f.empresa, entrega.itens, entrega.data), True
+
+
+def guardar_no_acervo(acervo, entrega, template_path, filename=None, dados=None):
+    # Copia para o acervo um PDF já gerado fora dele (ex: modo lote), do arquivo ou dos bytes.
+    # Se o mesmo comprovante já está no acervo, devolve o caminho dele.
+    f = entrega.funcionario
+    _, _, chave = _conteudo(entrega, template_path)
+    caminho = acervo.procurar(chave)
+    if caminho:
+        return caminho
+    if dados is None:
+        with open(filename, "rb") as arquivo:
+            dados = arquivo.read()
+    return acervo.guardar(chave, dados, f.nome, f.cnpj, f.empresa, entrega.itens, entrega.data)
+
+
+def registrar_historico(historico, entrega, pdf=""):
+    f = entrega.funcionario
+    return historico.registrar(f.nome, f.cnpj, f.empresa, entrega.itens, pdf=pdf, entregue_em=entrega.data,
+                               confirmacao=entrega.confirmacao)
+
+
+def registrar_pdf(historico, entrega, pdf):
+    # Completa com o PDF uma entrega registrada no histórico antes de o comprovante ficar pronto
+    return historico.definir_pdf(entrega.confirmacao, pdf)
+
+
+def entregar(entrega, template_path, filename, base_url, fila=None, cliente=None, historico=None, acervo=None):
+    # Fluxo completo: baixa (na fila local se informada, senão direto no Omie), PDF e histórico.
+    # Com acervo, o PDF é guardado nele (filename pode ser None) e o caminho no acervo é devolvido.
+    # Devolve (caminho do PDF, [ResultadoAjuste]); com a fila, os resultados vêm depois, pelo drenador.
+    resultados = []
+    if cliente is not None:
+        if fila is not None:
+            enfileirar_baixa(fila, cliente, entrega)
+        else:
+            resultados = ajustar_estoque(cliente, entrega)
+    if acervo is not None:
+        filename, _ = arquivar(entrega, template_path, base_url, acervo)
+    else:
+        renderizar(entrega, template_path, filename, base_url)
+    if historico is not None:
+        registrar_historico(historico, entrega, filename)
+    return filename, resultados
@@ -0,0 +1,166 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import os
+import struct
+import sys
+
+# Observa arquivos (os CSVs de cadastro) e avisa quando mudam, na thread do Tk.
+# No Linux usa o inotify (sem custo enquanto nada muda: o descritor entra no loop
+# de eventos do Tk), e em todos os sistemas compara mtime/tamanho a cada poucos
+# segundos: em pastas de rede (CIFS/NFS) o inotify é aceito, mas não recebe as
+# mudanças feitas em outras máquinas. A pasta inteira é observada para pegar
+# também os arquivos trocados por rename (gravação atômica).
+# Depois de um evento, espera o arquivo ficar estável por um instante antes de
+# avisar, para não reler um CSV que ainda está sendo gravado.
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_evento = struct.Struct("iIII")
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ObservadorArquivos:
+
+    def __init__(self, janela, caminhos, ao_mudar, intervalo=2000, atraso=500):
+        # ao_mudar(caminho) é chamado na thread do Tk, uma vez por mudança
+        self.janela = janela
+        self.caminhos = [os.path.abspath(c) for c in caminhos]
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self.atraso = atraso
+        self.modo = None
+        self._assinaturas = {c: _assinatura(c) for c in self.caminhos}
+        self._conferir_agendado = {}
+        self._fd = None
+        self._poll = None
+
+    def iniciar(self):
+        if not self._iniciar_inotify():
+            self.modo = "mtime"
+        self._poll = self.janela.after(self.intervalo, self._verificar_todos)
+        return self
+
+    def parar(self):
+        agendados = list(self._conferir_agendado.values())
+        if self._poll is not None:
+            agendados.append(self._poll)
+        self._poll = None
+        self._conferir_agendado.clear()
+        try:
+            if self._fd is not None:
+                self.janela.tk.deletefilehandler(self._fd)
+            for agendado in agendados:
+                self.janela.after_cancel(agendado)
+        except Exception:
+            # Janela já destruída: não há mais eventos a cancelar
+            pass
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # ---- inotify ----
+
+    def _iniciar_inotify(self):
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            import ctypes
+            import ctypes.util
+            import tkinter
+
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd < 0:
+                return False
+            self._nomes = {}
+            for pasta in {os.path.dirname(c) for c in self.caminhos}:
+                wd = libc.inotify_add_watch(fd, pasta.encode(), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+                if wd < 0:
+                    os.close(fd)
+                    return False
+                self._nomes[wd] = pasta
+            self.janela.tk.createfilehandler(fd, tkinter.READABLE, self._ler_eventos)
+        except Exception:
+            return False
+        self._fd = fd
+        self.modo = "inotify"
+        return True
+
+    def _ler_eventos(self, fd, mascara):
+        try:
+            dados = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + _evento.size <= len(dados):
+            wd, _, _, tamanho = _evento.unpack_from(dados, pos)
+            nome = dados[pos + _evento.size:pos + _evento.size + tamanho].rstrip(b"\0")
+            pos += _evento.size + tamanho
+            pasta = self._nomes.get(wd)
+            if pasta is None:
+                continue
+            caminho = os.path.join(pasta, os.fsdecode(nome))
+            if caminho in self._assinaturas:
+                self._agendar_conferencia(caminho)
+
+    # ---- mtime ----
+
+    def _verificar_todos(self):
+        self._poll = self.janela.after(self.intervalo, self._verificar_todos)
+        for caminho in self.caminhos:
+            if _assinatura(caminho) != self._assinaturas[caminho]:
+                self._agendar_conferencia(caminho)
+
+    # ---- Conferência ----
+
+    def _agendar_conferencia(self, caminho):
+        # Vários eventos seguidos (gravação em partes) viram uma única conferência
+        agendado = self._conferir_agendado.get(caminho)
+        if agendado:
+            self.janela.after_cancel(agendado)
+        anterior = _assinatura(caminho)
+        self._conferir_agendado[caminho] = self.janela.after(
+            self.atraso, lambda: self._conferir(caminho, anterior)
+        )
+
+    def _conferir(self, caminho, anterior):
+        self._conferir_agendado.pop(caminho, None)
+        atual = _assinatura(caminho)
+        if atual is None or atual == self._assinaturas[caminho]:
+            return
+        if atual != anterior:
+            # Ainda está sendo gravado: confere de novo em seguida
+            self._conferir_agendado[caminho] = self.janela.after(
+                self.atraso, lambda: self._conferir(caminho, atual)
+            )
+            return
+        self._assinaturas[caminho] = atual
+        self.ao_mudar(caminho)
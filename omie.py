@@ -0,0 +1,229 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import metricas
+
+# Cliente da API Omie para baixa de estoque (IncluirAjusteEstoque).
+# Usa uma sessão com conexões keep-alive reaproveitadas, envia os ajustes em
+# paralelo (limitado) e repete chamadas com falha transitória com backoff.
+# Só são repetidas as falhas em que a requisição certamente não foi processada
+# (conexão não estabelecida, HTTP 429/503): o IncluirAjusteEstoque não é
+# idempotente, então um timeout de leitura ou um 5xx depois do envio voltam como
+# "incertos" (a baixa pode ter sido feita) em vez de serem reenviados.
+# O requests só é importado na primeira chamada, para não pesar na abertura do app.
+
+# transitorio: falha antes do processamento, pode ser reenviada (conexão, 429, 503)
+# incerto: a requisição pode ter sido processada pelo Omie (timeout de leitura, outros 5xx)
+ResultadoAjuste = namedtuple("ResultadoAjuste", ["cod_int", "ok", "mensagem", "tentativas", "transitorio", "incerto"],
+                             defaults=(False,))
+
+# Status HTTP em que a requisição não foi processada (vale tentar novamente)
+_status_repetir = {429, 503}
+
+
+class ErroOmie(Exception):
+    pass
+
+
+class ErroTransitorio(Exception):
+
+    def __init__(self, mensagem, espera=None):
+        super().__init__(mensagem)
+        self.espera = espera
+
+
+class ErroIncerto(Exception):
+    pass
+
+
+def _falha_na_conexao(erro):
+    # Erro antes do envio da requisição: timeout de conexão, conexão recusada, DNS
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(erro, requests.ConnectTimeout):
+        return True
+    motivo = getattr(erro.args[0], "reason", None) if erro.args else None
+    return isinstance(motivo, NewConnectionError)
+
+
+def montar_ajuste(app_key, app_secret, cod_int, qtd, funcionario, data_omie, data_atual):
+    return {
+        "call": "IncluirAjusteEstoque",
+        "app_key": app_key,
+        "app_secret": app_secret,
+        "param": [{
+            "codigo_local_estoque": 0,
+            "cod_int": cod_int,
+            "data": data_omie,
+            "quan": str(qtd),
+            "obs": f"FOI ENTREGUE AO COLABORADOR {funcionario.upper()} O(S) EPI(S) RELACIONADOS NO COMPROVANTE GERADO EM {data_atual}.",
+            "origem": "AJU",
+            "tipo": "SAI",
+            "motivo": "INV"
+        }]
+    }
+
+
+class ClienteOmie:
+
+    def __init__(self, url, app_key, app_secret, conexoes=4, tentativas=3, timeout=10,
+                 backoff=0.5, intervalo_minimo=0.0):
+        self.url = url
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.conexoes = max(1, conexoes)
+        self.tentativas = max(1, tentativas)
+        self.timeout = timeout
+        self.backoff = backoff
+        self.intervalo_minimo = intervalo_minimo
+
+        self._sessao = None
+
+        # Controle de ritmo compartilhado entre as threads (limite de requisições da API)
+        self._lock = threading.Lock()
+        self._proximo_envio = 0.0
+        self._pausa_ate = 0.0
+
+    @property
+    def sessao(self):
+        with self._lock:
+            if self._sessao is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                sessao = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.conexoes)
+                sessao.mount("http://", adaptador)
+                sessao.mount("https://", adaptador)
+                self._sessao = sessao
+            return self._sessao
+
+    def fechar(self):
+        if self._sessao is not None:
+            self._sessao.close()
+
+    def montar_ajuste(self, cod_int, qtd, funcionario, data_omie, data_atual):
+        return montar_ajuste(self.app_key, self.app_secret, cod_int, qtd, funcionario, data_omie, data_atual)
+
+    def _aguardar_vez(self):
+        with self._lock:
+            agora = time.monotonic()
+            inicio = max(agora, self._proximo_envio, self._pausa_ate)
+            self._proximo_envio = inicio + self.intervalo_minimo
+        if inicio > agora:
+            time.sleep(inicio - agora)
+
+    def _pausar(self, segundos):
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+    def _enviar(self, payload, url):
+        import requests
+
+        self._aguardar_vez()
+        # Cada requisição é medida (latência e status), inclusive as novas tentativas
+        with metricas.span("omie", call=payload.get("call")) as span:
+            try:
+                response = self.sessao.post(url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                span["status"] = "timeout" if isinstance(e, requests.Timeout) else "erro_conexao"
+                if _falha_na_conexao(e):
+                    raise ErroTransitorio(f"Erro ao conectar com Omie: {str(e)}")
+                raise ErroIncerto(f"Sem resposta do Omie após o envio: {str(e)}")
+            span["status"] = response.status_code
+
+        if response.status_code in _status_repetir:
+            espera = None
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    espera = float(retry_after)
+                except ValueError:
+                    pass
+            raise ErroTransitorio(f"HTTP {response.status_code}", espera)
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+
+        # A Omie devolve erros de negócio com faultcode/faultstring (inclusive em HTTP 500)
+        if isinstance(result, dict) and result.get("faultcode"):
+            return False, result.get("faultstring") or str(result.get("faultcode")), result
+        if response.status_code >= 500:
+            raise ErroIncerto(f"HTTP {response.status_code}")
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}", result
+        return True, "", result
+
+    def _enviar_com_tentativas(self, payload, url, repetir_incertos=False):
+        # Devolve (ok, mensagem, resposta, tentativas, transitorio, incerto).
+        # repetir_incertos: só para consultas, que podem ser repetidas sem efeito colateral
+        mensagem = ""
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                ok, mensagem, result = self._enviar(payload, url)
+                return ok, mensagem, result, tentativa, False, False
+            except ErroIncerto as e:
+                mensagem = str(e)
+                if not repetir_incertos:
+                    return False, mensagem, None, tentativa, False, True
+                espera_retry = None
+            except ErroTransitorio as e:
+                mensagem = str(e)
+                espera_retry = e.espera
+            if tentativa == self.tentativas:
+                break
+            # Backoff exponencial com jitter, respeitando o Retry-After quando informado
+            espera = self.backoff * (2 ** (tentativa - 1))
+            espera = random.uniform(espera / 2, espera)
+            if espera_retry is not None:
+                espera = max(espera, espera_retry)
+                self._pausar(espera_retry)
+            time.sleep(espera)
+        return False, mensagem, None, self.tentativas, True, False
+
+    def incluir_ajuste(self, payload):
+        cod_int = payload["param"][0]["cod_int"]
+        ok, mensagem, _, tentativas, transitorio, incerto = self._enviar_com_tentativas(payload, self.url)
+        return ResultadoAjuste(cod_int, ok, mensagem, tentativas, transitorio, incerto)
+
+    def chamar(self, url, call, param, consulta=False):
+        # Chamada genérica à API (mesma sessão, ritmo e novas tentativas dos ajustes).
+        # consulta=True para chamadas que não alteram dados (ex: ListarProdutos): essas
+        # são repetidas também após timeout de leitura ou erro 5xx.
+        payload = {"call": call, "app_key": self.app_key, "app_secret": self.app_secret, "param": [param]}
+        ok, mensagem, result, _, _, _ = self._enviar_com_tentativas(payload, url, repetir_incertos=consulta)
+        if not ok:
+            raise ErroOmie(f"{call}: {mensagem}")
+        return result
+
+    def incluir_ajustes(self, payloads):
+        if not payloads:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.conexoes, len(payloads))) as pool:
+            return list(pool.map(self.incluir_ajuste, payloads))
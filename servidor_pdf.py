@@ -0,0 +1,153 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import comprovante
+
+# Servidor de PDFs para várias estações: um processo de longa duração que mantém
+# o WeasyPrint, as fontes e o template já carregados e renderiza os comprovantes
+# num pool de processos. As estações enviam os dados por HTTP e recebem o PDF.
+#
+#   POST /comprovante  {"funcionario", "empresa", "itens": [[codigo, descricao, qtd], ...], "data_hoje"}
+#   GET  /saude        -> 200 "ok"
+
+_tamanho_maximo = 1024 * 1024
+
+# Template e base_url de cada processo do pool
+_template_worker = None
+_base_url_worker = None
+
+
+def _iniciar_worker(template_path, base_url):
+    global _template_worker, _base_url_worker
+    _template_worker = template_path
+    _base_url_worker = base_url
+    # Aquece o processo: importa o WeasyPrint, descobre as fontes e interpreta o CSS
+    template = comprovante.carregar_template(template_path)
+    comprovante.renderizar_pdf(template, comprovante.montar_html(template, "", "", [], ""), base_url)
+
+
+def _nada():
+    pass
+
+
+def _renderizar(funcionario, empresa, itens, data_hoje):
+    template = comprovante.carregar_template(_template_worker)
+    html_final = comprovante.montar_html(template, funcionario, empresa, itens, data_hoje)
+    return comprovante.renderizar_pdf(template, html_final, _base_url_worker)
+
+
+def _validar(job):
+    funcionario = job["funcionario"]
+    empresa = job["empresa"]
+    data_hoje = job["data_hoje"]
+    itens = [(str(cod), str(desc), int(qtd)) for cod, desc, qtd in job["itens"]]
+    if not all(isinstance(v, str) for v in (funcionario, empresa, data_hoje)):
+        raise ValueError("campos de texto inválidos")
+    return funcionario, empresa, itens, data_hoje
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, corpo, tipo="text/plain; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path == "/saude":
+            self._responder(200, b"ok")
+        else:
+            self._responder(404, b"nao encontrado")
+
+    def do_POST(self):
+        if self.path != "/comprovante":
+            self._responder(404, b"nao encontrado")
+            return
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            tamanho = -1
+        if tamanho <= 0 or tamanho > _tamanho_maximo:
+            self.close_connection = True
+            self._responder(413 if tamanho > 0 else 400, b"tamanho invalido")
+            return
+        try:
+            job = _validar(json.loads(self.rfile.read(tamanho).decode("utf-8")))
+        except (ValueError, KeyError, TypeError) as e:
+            self._responder(400, f"requisicao invalida: {str(e)}".encode("utf-8"))
+            return
+        try:
+            pdf = self.server.pool.submit(_renderizar, *job).result(timeout=self.server.timeout_render)
+        except Exception as e:
+            self._responder(500, f"erro ao gerar PDF: {str(e)}".encode("utf-8"))
+            return
+        self._responder(200, pdf, "application/pdf")
+
+
+class ServidorPDF(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, endereco, template_path, base_url, processos=None, timeout_render=120):
+        super().__init__(endereco, _Handler)
+        self.timeout_render = timeout_render
+        processos = processos or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker,
+                                        initargs=(template_path, base_url))
+        # O pool só cria (e aquece) os processos nos primeiros envios: faz isso já na
+        # partida, para os primeiros comprovantes não pagarem o carregamento do WeasyPrint
+        for futuro in [self.pool.submit(_nada) for _ in range(processos)]:
+            futuro.result()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def renderizar_remoto(url, funcionario, empresa, itens, data_hoje, filename=None, timeout=60):
+    # Pede o PDF ao servidor e grava em filename (sem filename, devolve os bytes);
+    # erros de conexão sobem para o chamador
+    import requests
+
+    job = {
+        "funcionario": funcionario,
+        "empresa": empresa,
+        "itens": [[str(cod), desc, qtd] for cod, desc, qtd in itens],
+        "data_hoje": data_hoje,
+    }
+    response = requests.post(url.rstrip("/") + "/comprovante", json=job, timeout=timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"Servidor de PDF: HTTP {response.status_code} - {response.text}")
+    if filename is None:
+        return response.content
+    with open(filename, "wb") as f:
+        f.write(response.content)
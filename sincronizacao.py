@@ -0,0 +1,122 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import catalogo
+
+# Sincronização do catálogo de EPIs (data/estoque.csv) com o cadastro de produtos
+# do Omie (ListarProdutos). As páginas são buscadas em paralelo, com um número
+# limitado de respostas em memória; só é gravado algo quando há diferença, e o
+# CSV é reescrito linha a linha em um arquivo temporário trocado de uma vez.
+
+
+def _param_pagina(pagina, por_pagina):
+    return {
+        "pagina": pagina,
+        "registros_por_pagina": por_pagina,
+        "apenas_importado_api": "N",
+        "filtrar_apenas_omiepdv": "N",
+    }
+
+
+def _extrair(resposta, produtos, campo_codigo):
+    for p in resposta.get("produto_servico_cadastro") or []:
+        if p.get("inativo") == "S":
+            continue
+        codigo = str(p.get(campo_codigo) or "").strip()
+        descricao = str(p.get("descricao") or "").strip()
+        if codigo and descricao:
+            produtos[codigo] = descricao
+
+
+def listar_produtos(cliente, url, por_pagina=500, campo_codigo="codigo"):
+    # {codigo: descricao} dos produtos ativos no Omie
+    produtos = {}
+    primeira = cliente.chamar(url, "ListarProdutos", _param_pagina(1, por_pagina), consulta=True)
+    _extrair(primeira, produtos, campo_codigo)
+    total = int(primeira.get("total_de_paginas") or 1)
+
+    paginas = iter(range(2, total + 1))
+    limite = cliente.conexoes * 2
+    with ThreadPoolExecutor(max_workers=cliente.conexoes) as pool:
+        em_andamento = deque()
+        for pagina in paginas:
+            em_andamento.append(pool.submit(cliente.chamar, url, "ListarProdutos", _param_pagina(pagina, por_pagina), True))
+            if len(em_andamento) >= limite:
+                _extrair(em_andamento.popleft().result(), produtos, campo_codigo)
+        while em_andamento:
+            _extrair(em_andamento.popleft().result(), produtos, campo_codigo)
+    return produtos
+
+
+def gravar_diferenca(caminho, diferenca):
+    # Reescreve o CSV aplicando a diferença, preservando as demais colunas e linhas
+    temporario = caminho + ".tmp"
+    existe = os.path.exists(caminho)
+    try:
+        with open(temporario, "w", encoding="utf-8", newline="") as saida:
+            escritor = csv.writer(saida, delimiter=";")
+            if existe:
+                with open(caminho, "r", encoding="utf-8-sig", newline="") as entrada:
+                    leitor = csv.reader(entrada, delimiter=";")
+                    cabecalho = next(leitor)
+                    i_codigo = cabecalho.index("Código")
+                    i_descricao = cabecalho.index("Descrição")
+                    escritor.writerow(cabecalho)
+                    for linha in leitor:
+                        codigo = linha[i_codigo].strip() if len(linha) > i_codigo else ""
+                        if codigo in diferenca.removidos:
+                            continue
+                        if codigo in diferenca.alterados and len(linha) > i_descricao:
+                            linha[i_descricao] = diferenca.alterados[codigo][1]
+                        escritor.writerow(linha)
+            else:
+                cabecalho = ["Código", "Descrição"]
+                i_codigo, i_descricao = 0, 1
+                escritor.writerow(cabecalho)
+            for codigo, descricao in diferenca.inseridos:
+                linha = [""] * len(cabecalho)
+                linha[i_codigo] = codigo
+                linha[i_descricao] = descricao
+                escritor.writerow(linha)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def sincronizar(cliente, url, caminho, por_pagina=500, campo_codigo="codigo"):
+    # Devolve a catalogo.Diferenca aplicada (vazia se o CSV já estava em dia)
+    produtos = listar_produtos(cliente, url, por_pagina, campo_codigo)
+    locais = catalogo.ler_epis(caminho) if os.path.exists(caminho) else []
+    dif = catalogo.diferenca(locais, list(produtos.items()), catalogo.chave_epi)
+    if dif.inseridos or dif.removidos or dif.alterados:
+        gravar_diferenca(caminho, dif)
+    return dif
+
+
+def resumo(diferenca):
+    return (f"{len(diferenca.inseridos)} incluído(s), {len(diferenca.alterados)} alterado(s), "
+            f"{len(diferenca.removidos)} removido(s)")
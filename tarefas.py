@@ -0,0 +1,84 @@
+# =============================================================================
+# Nome do Software: Geracao de Recibos de EPIS
+#
+# Copyright (C) 2026 Alexandre Correia < dinhocorreia at gmail.com >
+#
+# Este programa é um software livre; você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU General Public License),
+# conforme publicada pela Free Software Foundation; na versão 3 da Licença,
+# ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na expectativa de que seja útil, porém,
+# SEM NENHUMA GARANTIA; sem mesmo a garantia implícita de COMERCIALIZAÇÃO
+# ou ADEQUAÇÃO A UMA FINALIDADE ESPECÍFICA. Consulte a Licença Pública Geral
+# GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU junto com
+# este programa. Caso contrário, consulte <https://www.gnu.org/licenses/>.
+#
+# =============================================================================
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# Execução de tarefas demoradas (PDF, rede) fora do loop de eventos do Tk.
+# As tarefas rodam em threads; os resultados voltam por uma fila que é lida
+# com janela.after(), então os callbacks sempre executam na thread do Tk.
+
+
+class ExecutorTk:
+
+    def __init__(self, janela, max_workers=1, intervalo=50):
+        self.janela = janela
+        self.intervalo = intervalo
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tarefa")
+        self._resultados = queue.Queue()
+        self._pendentes = 0
+        self._agendado = False
+        self._ouvintes = []
+
+    @property
+    def pendentes(self):
+        return self._pendentes
+
+    def ao_mudar(self, callback):
+        # callback(pendentes) é chamado sempre que o número de tarefas em andamento muda
+        self._ouvintes.append(callback)
+
+    def enviar(self, funcao, *args, ao_concluir=None, ao_falhar=None):
+        futuro = self._pool.submit(funcao, *args)
+        self._pendentes += 1
+        self._notificar()
+        futuro.add_done_callback(lambda f: self._resultados.put((f, ao_concluir, ao_falhar)))
+        if not self._agendado:
+            self._agendado = True
+            self.janela.after(self.intervalo, self._processar)
+        return futuro
+
+    def encerrar(self, esperar=True):
+        self._pool.shutdown(wait=esperar)
+
+    def _notificar(self):
+        for callback in self._ouvintes:
+            callback(self._pendentes)
+
+    def _processar(self):
+        try:
+            while True:
+                try:
+                    futuro, ao_concluir, ao_falhar = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self._pendentes -= 1
+                self._notificar()
+                erro = futuro.exception()
+                if erro is not None:
+                    if ao_falhar:
+                        ao_falhar(erro)
+                elif ao_concluir:
+                    ao_concluir(futuro.result())
+        finally:
+            if self._pendentes:
+                self.janela.after(self.intervalo, self._processar)
+            else:
+                self._agendado = False